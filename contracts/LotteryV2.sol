@@ -5,6 +5,12 @@ pragma solidity ^0.8.0;
 // If you have ticket, you can take part in lottery
 // Picking random winner based on random number provided by chainlink
 // Same address can buy ticket multiple times, which will increase its winning chance
+// Tickets bought in one purchase are stored as one entry with cumulative ticket boundary, winning ticket is found with binary search
+// Entries and results are kept per round, so closing round costs the same no matter how many players took part
+// In pull payments mode prize and commission are only recorded in callback and have to be claimed with withdraw()
+// With price refresh interval set, ETH/USD price is snapshotted in startLottery() and read from price feed again only when snapshot gets older than interval
+// Hot path state shares storage slots: lottery state, payout mode and current round are packed next to Ownable owner,
+// round result keeps winner with transfer flags and prize with commission, random word is only emitted in WinnerPicked
 
 import "@chainlink/contracts/src/v0.8/interfaces/VRFCoordinatorV2Interface.sol";
 import "@chainlink/contracts/src/v0.8/interfaces/AggregatorV3Interface.sol";
@@ -20,15 +26,31 @@ contract LotteryV2 is VRFConsumerBaseV2, Ownable {
     }
 
     /* Lottery Variables */
+    // Entry covers tickets from previous entry "ticketsEnd" up to its own "ticketsEnd" (exclusive), both fit in one slot
+    struct Entry {
+        address payable player;
+        uint96 ticketsEnd;
+    }
+
+    // Result of finished round, winner with transfer flags and prize with commission fit in one slot each (uint128 is far above all ETH in existence)
+    struct Round {
+        address payable winner;
+        bool success;
+        bool sent;
+        uint128 prize;
+        uint128 commission;
+        uint256 requestId;
+    }
+
+    // Packed into the same slot as Ownable owner, so buyTickets(), pickWinner() and fulfillRandomWords() read all of them at once
     LotteryState private lotteryState;
-    address private immutable i_owner;
-    address payable[] private players;
-    uint256[] public s_randomWords;
-    address public winner;
-    uint256 public prize;
-    uint256 private commission;
-    bool private success;
-    bool private sent;
+    bool private s_pullPayments;
+    uint64 private s_currentRound;
+    mapping(uint256 => Entry[]) private s_entries;
+    mapping(uint256 => Round) private s_rounds;
+    // Balances owed in pull payments mode, they are not part of any round prize pool
+    mapping(address => uint256) private s_pendingWithdrawals;
+    uint256 private s_totalPendingWithdrawals;
 
     /* VRFConsumerBaseV2 state variables */
     // We add "_i" to all immutable variables
@@ -38,10 +60,16 @@ contract LotteryV2 is VRFConsumerBaseV2, Ownable {
     uint32 private immutable i_callbackGasLimit;
     uint16 private constant REQUEST_CONFIRMATIONS = 3;
     uint32 private constant NUM_WORDS = 1;
+    // Commission recipient is fixed at deployment, so renouncing or transferring ownership can't redirect or burn commission of running round
+    address private immutable i_owner;
 
     /* Calculating entryFee */
     AggregatorV3Interface internal price_feed;
     uint256 private entryFee;
+    // Price snapshot, all three fit in one slot. Interval 0 means price feed is read on every ticket
+    uint128 private s_cachedPrice;
+    uint64 private s_cachedPriceUpdatedAt;
+    uint64 private s_priceRefreshInterval;
 
     /* Errors */
     error Lottery__SendMoreToEnterLottery();
@@ -49,11 +77,14 @@ contract LotteryV2 is VRFConsumerBaseV2, Ownable {
     error Lottery__LotteryAlreadyWorking();
     error Lottery__LotteryNotCalculatingWinnerYet();
     error Lottery__TransferFailed();
+    error Lottery__InvalidTicketCount();
+    error Lottery__NothingToWithdraw();
 
     /* Events */
-    event LotteryEntrance(address indexed player);
-    event RequestedLotteryWinner(uint256 indexed requestId);
-    event WinnerPicked(address indexed recentWinner);
+    event LotteryEntrance(address indexed player, uint256 indexed roundId, uint256 tickets);
+    event RequestedLotteryWinner(uint256 indexed requestId, uint256 indexed roundId);
+    event WinnerPicked(address indexed recentWinner, uint256 indexed roundId, uint256 randomWord, uint256 prize, uint256 commission);
+    event Withdrawal(address indexed payee, uint256 amount);
 
     constructor(
         address _priceFeedAddress,
@@ -77,19 +108,48 @@ contract LotteryV2 is VRFConsumerBaseV2, Ownable {
             revert Lottery__LotteryAlreadyWorking();
         }
         lotteryState = LotteryState.OPEN;
+        if (s_priceRefreshInterval != 0) {
+            updatePriceSnapshot();
+        }
+    }
+
+    // Below function enables (interval > 0) or disables (interval == 0) price snapshots, interval is maximal snapshot age in seconds.
+    // Snapshot left from earlier round must not price tickets of open round, so it is taken again when snapshots are enabled mid-round.
+    function setPriceRefreshInterval(uint64 interval) public onlyOwner {
+        s_priceRefreshInterval = interval;
+        if (interval != 0 && lotteryState == LotteryState.OPEN) {
+            updatePriceSnapshot();
+        }
+    }
+
+    function getPriceSnapshot() public view returns (uint256 price, uint256 updatedAt, uint256 refreshInterval) {
+        return (s_cachedPrice, s_cachedPriceUpdatedAt, s_priceRefreshInterval);
     }
 
     // Below function allows you to buy lottery participation ticket.
     function buyTicket() public payable {
-        // require(msg.value >= getEntryFee(), "Not Enough ETH, you have to pay to participate in lottery!");
-        if (msg.value < getEntryFee()) {
+        buyTickets(1);
+    }
+
+    // Below function allows you to buy many tickets at once, every ticket has the same winning chance as ticket bought with buyTicket().
+    function buyTickets(uint256 count) public payable {
+        if (count == 0) {
+            revert Lottery__InvalidTicketCount();
+        }
+        // require(msg.value >= getEntryFee() * count, "Not Enough ETH, you have to pay to participate in lottery!");
+        if (msg.value < refreshEntryFee() * count) {
             revert Lottery__SendMoreToEnterLottery();
         }
         if (lotteryState != LotteryState.OPEN) {
             revert Lottery__LotteryNotOpen();
         }
-        players.push(payable(msg.sender));
-        emit LotteryEntrance(msg.sender);
+        uint256 roundId = s_currentRound;
+        uint256 ticketsEnd = getRoundTicketsCount(roundId) + count;
+        if (ticketsEnd > type(uint96).max) {
+            revert Lottery__InvalidTicketCount();
+        }
+        s_entries[roundId].push(Entry(payable(msg.sender), uint96(ticketsEnd)));
+        emit LotteryEntrance(msg.sender, roundId, count);
     }
 
     // Below function defines minimal fee to use buyTicket() function.
@@ -97,9 +157,42 @@ contract LotteryV2 is VRFConsumerBaseV2, Ownable {
         if (lotteryState != LotteryState.OPEN) {
             revert Lottery__LotteryNotOpen();
         }
+        if (s_priceRefreshInterval != 0 && !isPriceSnapshotStale()) {
+            return calculateEntryFee(s_cachedPrice);
+        }
+        return calculateEntryFee(getLatestPrice());
+    }
+
+    // Same as getEntryFee(), but stale price snapshot is refreshed, so next tickets don't have to call price feed.
+    function refreshEntryFee() internal returns (uint256) {
+        if (lotteryState != LotteryState.OPEN) {
+            revert Lottery__LotteryNotOpen();
+        }
+        if (s_priceRefreshInterval == 0) {
+            return calculateEntryFee(getLatestPrice());
+        }
+        if (isPriceSnapshotStale()) {
+            updatePriceSnapshot();
+        }
+        return calculateEntryFee(s_cachedPrice);
+    }
+
+    function isPriceSnapshotStale() internal view returns (bool) {
+        return block.timestamp - s_cachedPriceUpdatedAt >= s_priceRefreshInterval;
+    }
+
+    function updatePriceSnapshot() internal {
+        s_cachedPrice = uint128(getLatestPrice());
+        s_cachedPriceUpdatedAt = uint64(block.timestamp);
+    }
+
+    function getLatestPrice() internal view returns (uint256) {
         (, int256 price, , , ) = price_feed.latestRoundData();
         // Below has to be expressed with 18 decimals. From Chainlink pricefeed, we know ETH/USD has 8 decimals, so we need to multiply by 10^10.
-        uint256 adjustedPrice = uint256(price) * 10 ** 10;
+        return uint256(price) * 10 ** 10;
+    }
+
+    function calculateEntryFee(uint256 adjustedPrice) internal view returns (uint256) {
         // We cannot return decimals, hence we need to express 50$ with 50 * 10*18 / 2000 (adjusted price of ETH).
         uint256 costToEnter = (entryFee * 10 ** 18) / adjustedPrice;
         return costToEnter;
@@ -107,8 +200,10 @@ contract LotteryV2 is VRFConsumerBaseV2, Ownable {
 
     function pickWinner() public onlyOwner {
         lotteryState = LotteryState.CALCULATING;
+        uint256 roundId = s_currentRound;
         uint256 requestId = i_vrfCoordinator.requestRandomWords(i_gasLane, i_subsId, REQUEST_CONFIRMATIONS, i_callbackGasLimit, NUM_WORDS);
-        emit RequestedLotteryWinner(requestId);
+        s_rounds[roundId].requestId = requestId;
+        emit RequestedLotteryWinner(requestId, roundId);
     }
 
     // We have to override fulfillRandomWords() as it is "virtual" -> which means it expecting to be overwritten, otherwise we cant compile code.
@@ -116,42 +211,166 @@ contract LotteryV2 is VRFConsumerBaseV2, Ownable {
         if (lotteryState != LotteryState.CALCULATING) {
             revert Lottery__LotteryNotCalculatingWinnerYet();
         }
-        uint256 indexOfWinner = randomWords[0] % players.length;
-        address payable recentWinner = players[indexOfWinner];
-        winner = recentWinner;
-        s_randomWords = randomWords;
-        // Resetting "players" array and closing lottery
-        players = new address payable[](0);
+        uint256 roundId = s_currentRound;
+        Entry[] storage entries = s_entries[roundId];
+        uint256 winningTicket = randomWords[0] % entries[entries.length - 1].ticketsEnd;
+        address payable recentWinner = entries[findEntry(entries, winningTicket)].player;
+        // Opening next round with empty entries instead of clearing current ones and closing lottery (both share one slot)
+        s_currentRound = uint64(roundId + 1);
         lotteryState = LotteryState.CLOSED;
 
-        // Transfering money to winner using call(bool sent, bytes memory data) function:
-        /* 95% of Lottery contract balance is prize for winner */
-        prize = (address(this).balance * 19) / 20;
-        /* 5% of Lottery contract balance is payment for Lottery owner */
-        commission = (address(this).balance * 1) / 20;
-        (success, ) = recentWinner.call{value: prize}("Prize For Winner Transferred!");
-        (sent, ) = i_owner.call{value: commission}("Commission For Lottery Owner Transferred!");
-        if (!success || !sent) {
+        uint256 totalPendingWithdrawals = s_totalPendingWithdrawals;
+        uint256 prizePool = address(this).balance - totalPendingWithdrawals;
+        /* 95% of Lottery prize pool is prize for winner */
+        uint256 prize = (prizePool * 19) / 20;
+        /* 5% of Lottery prize pool is payment for Lottery owner */
+        uint256 commission = (prizePool * 1) / 20;
+        // In pull payments mode both transfer flags stay "false" as nothing is sent
+        bool success = false;
+        bool sent = false;
+        if (s_pullPayments) {
+            // Only recording what is owed, so failing transfer can't revert fulfillment
+            s_pendingWithdrawals[recentWinner] += prize;
+            s_pendingWithdrawals[i_owner] += commission;
+            s_totalPendingWithdrawals = totalPendingWithdrawals + prize + commission;
+        } else {
+            // Transfering money to winner using call(bool sent, bytes memory data) function:
+            (success, ) = recentWinner.call{value: prize}("Prize For Winner Transferred!");
+            (sent, ) = payable(i_owner).call{value: commission}("Commission For Lottery Owner Transferred!");
+            if (!success || !sent) {
+                revert Lottery__TransferFailed();
+            }
+        }
+        // Round result is written once after transfers, fields of each slot are assigned together so optimizer stores every slot with one SSTORE
+        Round storage round = s_rounds[roundId];
+        round.winner = recentWinner;
+        round.success = success;
+        round.sent = sent;
+        round.prize = uint128(prize);
+        round.commission = uint128(commission);
+        // Random word isn't stored, it is only part of the event
+        emit WinnerPicked(recentWinner, roundId, randomWords[0], prize, commission);
+    }
+
+    // Below function allows winners and owner to claim everything they are owed from all rounds finished in pull payments mode.
+    function withdraw() public {
+        uint256 amount = s_pendingWithdrawals[msg.sender];
+        if (amount == 0) {
+            revert Lottery__NothingToWithdraw();
+        }
+        s_pendingWithdrawals[msg.sender] = 0;
+        s_totalPendingWithdrawals -= amount;
+        (bool sent, ) = payable(msg.sender).call{value: amount}("");
+        if (!sent) {
             revert Lottery__TransferFailed();
         }
-        emit WinnerPicked(recentWinner);
+        emit Withdrawal(msg.sender, amount);
     }
 
+    // Payout mode can be changed only between rounds.
+    function setPullPayments(bool enabled) public onlyOwner {
+        if (lotteryState != LotteryState.CLOSED) {
+            revert Lottery__LotteryAlreadyWorking();
+        }
+        s_pullPayments = enabled;
+    }
+
+    function getPullPayments() public view returns (bool) {
+        return s_pullPayments;
+    }
+
+    function getPendingWithdrawal(address payee) public view returns (uint256) {
+        return s_pendingWithdrawals[payee];
+    }
+
+    // Below function returns transfers of recently finished round, in pull payments mode both transfers are "false" as nothing was sent.
     function getLotteryTransactions() public view returns (uint256, uint256, bool, bool) {
-        return (prize, commission, success, sent);
+        Round storage round = s_rounds[getLastRoundId()];
+        return (round.prize, round.commission, round.success, round.sent);
+    }
+
+    // Below function returns index of entry which contains given ticket, so the first entry with "ticketsEnd" above it.
+    function findEntry(Entry[] storage entries, uint256 ticket) internal view returns (uint256) {
+        uint256 low = 0;
+        uint256 high = entries.length - 1;
+        while (low < high) {
+            uint256 mid = (low + high) / 2;
+            if (entries[mid].ticketsEnd > ticket) {
+                high = mid;
+            } else {
+                low = mid + 1;
+            }
+        }
+        return low;
     }
 
+    // Players of current round are returned once per purchase, so player who bought 5 tickets at once is listed once.
     function getPlayers() public view returns (address payable[] memory, uint256) {
-        uint256 players_amount = players.length;
-        return (players, players_amount);
+        uint256 players_amount = getPlayersCount();
+        return (getPlayersRange(0, players_amount), players_amount);
+    }
+
+    function getPlayersCount() public view returns (uint256) {
+        return getRoundPlayersCount(s_currentRound);
+    }
+
+    function getTicketsCount() public view returns (uint256) {
+        return getRoundTicketsCount(s_currentRound);
+    }
+
+    // Below function returns up to "limit" players of current round starting from "offset", so big rounds can be read page by page.
+    function getPlayersRange(uint256 offset, uint256 limit) public view returns (address payable[] memory) {
+        return getRoundPlayersRange(s_currentRound, offset, limit);
+    }
+
+    function getRoundPlayersCount(uint256 roundId) public view returns (uint256) {
+        return s_entries[roundId].length;
+    }
+
+    function getRoundTicketsCount(uint256 roundId) public view returns (uint256) {
+        Entry[] storage entries = s_entries[roundId];
+        uint256 entries_amount = entries.length;
+        if (entries_amount == 0) {
+            return 0;
+        }
+        return entries[entries_amount - 1].ticketsEnd;
+    }
+
+    function getRoundPlayersRange(uint256 roundId, uint256 offset, uint256 limit) public view returns (address payable[] memory) {
+        Entry[] storage entries = s_entries[roundId];
+        uint256 players_amount = entries.length;
+        if (offset >= players_amount) {
+            return new address payable[](0);
+        }
+        uint256 end = limit > players_amount - offset ? players_amount : offset + limit;
+        address payable[] memory page = new address payable[](end - offset);
+        for (uint256 i = offset; i < end; i++) {
+            page[i - offset] = entries[i].player;
+        }
+        return page;
     }
 
     function getLotteryState() public view returns (LotteryState) {
         return lotteryState;
     }
 
+    // Below function returns winner of recently finished round.
     function getWinner() public view returns (address) {
-        return winner;
+        return s_rounds[getLastRoundId()].winner;
+    }
+
+    // Round which is currently open or waiting for winner, all rounds before it are finished.
+    function getCurrentRoundId() public view returns (uint256) {
+        return s_currentRound;
+    }
+
+    // Before first round is finished there are no results, so empty round 0 is returned.
+    function getLastRoundId() public view returns (uint256) {
+        return s_currentRound == 0 ? 0 : s_currentRound - 1;
+    }
+
+    function getRound(uint256 roundId) public view returns (Round memory) {
+        return s_rounds[roundId];
     }
 
     function getLotteryBalance() public view onlyOwner returns (uint256) {
@@ -0,0 +1,211 @@
+from scripts.helpful_scripts import get_account, get_contract, LOCAL_BLOCKCHAIN_ENVIRONMENTS
+from scripts.bulk_purchase import buy_tickets_bulk
+from scripts.fee_cache import entry_fee_cache
+from scripts.rpc_tracking import count_rpc_calls
+from brownie import network, config, accounts, web3, LotteryV2
+from contextlib import contextmanager
+import json
+import os
+import time
+
+# Measuring how LotteryV2 behaves as a round grows (local development chain with VRFCoordinatorV2Mock only).
+# For every player count we deploy fresh lottery and play few consecutive rounds, recording:
+# gas used, wall-clock time and RPC calls per phase, "getPlayers" response size and fulfillment gas.
+# Reports made before and after contract change can be compared with "compare", which prints mean gas per phase as table.
+
+PLAYER_COUNTS = [1, 10, 50, 100, 200]
+ROUNDS = 2
+# Fulfillments of many rounds have to be paid by subscription, so we fund it generously
+BENCHMARK_FUND_AMOUNT = 1000 * 10 ** 18
+REPORT_PATH = os.path.join("reports", "benchmark_lottery.json")
+# Sample fields compared by "compare"
+GAS_FIELDS = ["start_gas", "buy_ticket_gas_avg", "pick_winner_gas", "fulfill_gas"]
+
+
+def main(player_counts = None, rounds = None):
+    # Usage: brownie run scripts/benchmark_lottery.py main "1,10,50" 3
+    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
+        print("This Function Doesn't Work On TestNet")
+        return
+    player_counts = [int(count) for count in player_counts.split(",")] if player_counts else PLAYER_COUNTS
+    rounds = int(rounds) if rounds else ROUNDS
+    report = run_benchmark(player_counts, rounds)
+    write_report(report, os.getenv("BENCHMARK_REPORT", REPORT_PATH))
+    print_summary(report)
+
+
+def compare(before_path, after_path):
+    # Usage: brownie run scripts/benchmark_lottery.py compare reports/before.json reports/after.json
+    with open(before_path) as before_file:
+        before = json.load(before_file)
+    with open(after_path) as after_file:
+        after = json.load(after_file)
+    if (before["player_counts"], before["rounds"]) != (after["player_counts"], after["rounds"]):
+        print("WARNING: Reports Were Made With Different Player Counts Or Rounds, Means Aren't Comparable!")
+    print(gas_comparison_table(before, after))
+
+
+def gas_comparison_table(before, after):
+    # Markdown table of mean gas per phase, samples of both reports are averaged over all player counts and rounds
+    lines = ["| Phase | Before | After | Change |", "| --- | ---: | ---: | ---: |"]
+    for field in GAS_FIELDS:
+        before_gas = mean_gas(before, field)
+        after_gas = mean_gas(after, field)
+        change = (after_gas - before_gas) / before_gas if before_gas else 0
+        lines.append(f'| {field} | {before_gas:.0f} | {after_gas:.0f} | {change:+.2%} |')
+    return "\n".join(lines)
+
+
+def mean_gas(report, field):
+    values = [sample[field] for sample in report["samples"]]
+    return sum(values) / len(values) if values else 0
+
+
+@contextmanager
+def measure_phase(phases, name):
+    # Records wall-clock time and RPC calls of one phase into "phases" dict
+    with count_rpc_calls() as counts:
+        started = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - started
+    phases[name] = {"seconds": elapsed, "rpc_calls": sum(counts.values()), "rpc_calls_by_method": dict(counts)}
+
+
+def run_benchmark(player_counts, rounds):
+    account = get_account()
+    callback_gas_limit = config["networks"][network.show_active()]["callbackGasLimit"]
+    vrfCoordinatorV2Mock = get_contract("vrf_coordinator_v2")
+    create_sub_tx = vrfCoordinatorV2Mock.createSubscription({"from": account})
+    subId = create_sub_tx.return_value
+    vrfCoordinatorV2Mock.fundSubscription(subId, BENCHMARK_FUND_AMOUNT, {"from": account})
+
+    samples = []
+    for player_count in player_counts:
+        lottery = LotteryV2.deploy(
+            get_contract("eth_usd_price_feed").address,
+            vrfCoordinatorV2Mock.address,
+            config["networks"][network.show_active()]["gasLane"],
+            subId,
+            callback_gas_limit,
+            {"from": account},
+        )
+        vrfCoordinatorV2Mock.addConsumer(subId, lottery.address, {"from": account})
+        for round_number in range(rounds):
+            samples.append(benchmark_round(lottery, vrfCoordinatorV2Mock, player_count, round_number))
+            print(f'Players: {player_count}, Round: {round_number}, Fulfillment Gas: {samples[-1]["fulfill_gas"]}')
+
+    return {
+        "network": network.show_active(),
+        "callback_gas_limit": callback_gas_limit,
+        "player_counts": player_counts,
+        "rounds": rounds,
+        "samples": samples,
+        "fulfillment": analyze_fulfillment(samples, callback_gas_limit),
+    }
+
+
+def benchmark_round(lottery, vrf_coordinator, player_count, round_number):
+    account = get_account()
+    phases = {}
+    with measure_phase(phases, "start"):
+        start_tx = lottery.startLottery({"from": account})
+    entry_fee_cache.invalidate(lottery)
+
+    # Spreading tickets over all local accounts
+    purchases = [(accounts[i % len(accounts)], 1) for i in range(player_count)]
+    with measure_phase(phases, "buy"):
+        result = buy_tickets_bulk(lottery, purchases)
+    if result.failures:
+        raise Exception(f'Failed to buy {len(result.failures)} tickets: {result.failures[0].error}')
+    buy_gas = [receipt.tx.gas_used for receipt in result.receipts]
+
+    with measure_phase(phases, "get_players"):
+        call = {"to": lottery.address, "data": lottery.getPlayers.encode_input()}
+        players_response = web3.eth.call(call)
+        get_players_gas = web3.eth.estimate_gas(call)
+
+    with measure_phase(phases, "pick_winner"):
+        pick_winner_tx = lottery.pickWinner({"from": account})
+    requestId = pick_winner_tx.events["RequestedLotteryWinner"]["requestId"]
+
+    with measure_phase(phases, "fulfill"):
+        fulfill_tx = vrf_coordinator.fulfillRandomWords(requestId, lottery.address, {"from": account})
+    fulfilled = fulfill_tx.events["RandomWordsFulfilled"]["success"]
+
+    return {
+        "players": player_count,
+        "round": round_number,
+        "start_gas": start_tx.gas_used,
+        "buy_ticket_gas_avg": sum(buy_gas) / len(buy_gas) if buy_gas else 0,
+        "buy_ticket_gas_max": max(buy_gas) if buy_gas else 0,
+        "get_players_gas": get_players_gas,
+        "get_players_response_bytes": len(players_response),
+        "pick_winner_gas": pick_winner_tx.gas_used,
+        # Gas of whole fulfillment transaction, callback itself can't use more than that,
+        # so comparing it with callback gas limit is a conservative estimate
+        "fulfill_gas": fulfill_tx.gas_used,
+        "fulfill_success": fulfilled,
+        "phases": phases,
+    }
+
+
+def analyze_fulfillment(samples, callback_gas_limit):
+    # Finding player count at which fulfillment would no longer fit into callback gas limit:
+    # 1. smallest measured player count that already exceeded it or failed
+    # 2. projection from linear fit of fulfillment gas against player count
+    # With round-keyed storage fulfillment gas should stay flat, "growth" shows how much it changed between smallest and biggest round
+    exceeded = [sample["players"] for sample in samples if sample["fulfill_gas"] > callback_gas_limit or not sample["fulfill_success"]]
+    points = [(sample["players"], sample["fulfill_gas"]) for sample in samples]
+    slope, intercept = linear_fit(points)
+    projected = None
+    if slope > 0:
+        projected = max(int((callback_gas_limit - intercept) / slope) + 1, 0)
+    gas_by_players = {}
+    for players, gas in points:
+        gas_by_players.setdefault(players, []).append(gas)
+    mean_gas_by_players = {players: sum(gas) / len(gas) for players, gas in sorted(gas_by_players.items())}
+    growth = None
+    if mean_gas_by_players:
+        means = list(mean_gas_by_players.values())
+        growth = means[-1] / means[0] - 1
+    return {
+        "gas_per_player": slope,
+        "base_gas": intercept,
+        "mean_gas_by_players": mean_gas_by_players,
+        "growth": growth,
+        "exceeded_at_players": min(exceeded) if exceeded else None,
+        "projected_limit_players": projected,
+    }
+
+
+def linear_fit(points):
+    # Least squares fit of y = slope * x + intercept
+    if not points:
+        return 0, 0
+    count = len(points)
+    mean_x = sum(x for x, _ in points) / count
+    mean_y = sum(y for _, y in points) / count
+    variance = sum((x - mean_x) ** 2 for x, _ in points)
+    if variance == 0:
+        return 0, mean_y
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / variance
+    return slope, mean_y - slope * mean_x
+
+
+def write_report(report, path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as report_file:
+        json.dump(report, report_file, indent=4)
+    print(f'Benchmark Report Saved To: {path}')
+
+
+def print_summary(report):
+    fulfillment = report["fulfillment"]
+    print(f'Fulfillment Gas Per Player: {fulfillment["gas_per_player"]}')
+    print(f'Fulfillment Gas Growth From Smallest To Biggest Round: {fulfillment["growth"]:.2%}')
+    if fulfillment["exceeded_at_players"] is not None:
+        print(f'WARNING: Fulfillment Exceeded Callback Gas Limit At {fulfillment["exceeded_at_players"]} Players!')
+    if fulfillment["projected_limit_players"] is not None:
+        print(f'Callback Gas Limit {report["callback_gas_limit"]} Will Be Exceeded At ~{fulfillment["projected_limit_players"]} Players')
@@ -0,0 +1,110 @@
+from scripts.helpful_scripts import LOCAL_BLOCKCHAIN_ENVIRONMENTS
+from scripts.waiters import wait_for_confirmation, CONFIRMATION_TIMEOUT
+from scripts.fee_cache import entry_fee_cache, get_entry_fee
+from brownie import network, accounts, LotteryV2
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional
+import threading
+
+# Buying many tickets at once for load rehearsals.
+# 1. Nonces are pre-assigned per sender, so transactions of one sender don't have to wait for each other
+# 2. Senders submit concurrently, with at most "max_in_flight" unconfirmed transactions at any time
+# 3. All pending transactions are confirmed in bulk, failed tickets don't stall rest of the batch
+# With "batch_tickets" every (account, ticket_count) purchase is sent as one "buyTickets" transaction
+
+MAX_IN_FLIGHT = 32
+# Adding some wei for bufor, same as in "run_lottery.buy_ticket"
+ENTRY_FEE_BUFFER = 10 ** 8
+
+
+class TicketReceipt(NamedTuple):
+    account: str
+    nonce: int
+    tx: object
+    tickets: int = 1
+
+
+class TicketFailure(NamedTuple):
+    account: str
+    nonce: Optional[int]
+    error: str
+    tx: object = None
+    tickets: int = 1
+
+
+class BulkPurchaseResult(NamedTuple):
+    receipts: list
+    failures: list
+
+
+def main():
+    # Filling latest lottery with one ticket from every local account
+    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
+        print("This Function Doesn't Work On TestNet")
+        return
+    result = buy_tickets_bulk(LotteryV2[-1], [(account, 1) for account in accounts])
+    print(f'Bought Tickets: {len(result.receipts)}')
+    print(f'Failed Tickets: {len(result.failures)}')
+
+
+def buy_tickets_bulk(lottery, purchases, entry_fee=None, max_in_flight=MAX_IN_FLIGHT, confirmations=1, timeout=CONFIRMATION_TIMEOUT, batch_tickets=False, round_id=None):
+    # "purchases" is a list of (account, ticket_count) tuples, same account can appear more than once
+    # "entry_fee" is price of single ticket, "round_id" (if known) makes sure it isn't fee cached for previous round
+    if entry_fee is None:
+        entry_fee = get_entry_fee(lottery, round_id) + ENTRY_FEE_BUFFER
+    # Ticket counts of every transaction sent by given sender
+    transactions_per_sender = {}
+    senders = {}
+    for account, ticket_count in purchases:
+        ticket_counts = [ticket_count] if batch_tickets else [1] * ticket_count
+        transactions_per_sender.setdefault(account.address, []).extend(ticket_counts)
+        senders[account.address] = account
+
+    in_flight = threading.BoundedSemaphore(max_in_flight)
+    results_lock = threading.Lock()
+    receipts = []
+    failures = []
+    confirm_executor = ThreadPoolExecutor(max_workers=max_in_flight)
+
+    def confirm(account, nonce, tx, tickets):
+        try:
+            wait_for_confirmation(tx, confirmations, timeout)
+            with results_lock:
+                if tx.status == 1:
+                    receipts.append(TicketReceipt(account.address, nonce, tx, tickets))
+                else:
+                    failures.append(TicketFailure(account.address, nonce, tx.revert_msg or "reverted", tx, tickets))
+        except Exception as error:
+            with results_lock:
+                failures.append(TicketFailure(account.address, nonce, str(error), tx, tickets))
+        finally:
+            in_flight.release()
+
+    def submit_all(address):
+        account = senders[address]
+        # Pre-assigned nonce, it moves forward only if transaction was actually broadcast
+        nonce = account.nonce
+        for tickets in transactions_per_sender[address]:
+            in_flight.acquire()
+            try:
+                if tickets == 1:
+                    tx = lottery.buyTicket({"from": account, "value": entry_fee, "nonce": nonce, "required_confs": 0})
+                else:
+                    tx = lottery.buyTickets(tickets, {"from": account, "value": entry_fee * tickets, "nonce": nonce, "required_confs": 0})
+            except Exception as error:
+                # e.g. "Lottery__SendMoreToEnterLottery" caught while estimating gas, nonce was not used
+                in_flight.release()
+                with results_lock:
+                    failures.append(TicketFailure(address, None, str(error), None, tickets))
+                continue
+            confirm_executor.submit(confirm, account, nonce, tx, tickets)
+            nonce += 1
+
+    with ThreadPoolExecutor(max_workers=min(max_in_flight, max(len(senders), 1))) as submit_executor:
+        list(submit_executor.map(submit_all, senders))
+    confirm_executor.shutdown(wait=True)
+    if failures:
+        # Tickets could fail because price changed since fee was cached, so next batch reads it again
+        entry_fee_cache.invalidate(lottery)
+    receipts.sort(key=lambda receipt: (receipt.account, receipt.nonce))
+    return BulkPurchaseResult(receipts, failures)
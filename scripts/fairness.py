@@ -0,0 +1,218 @@
+from scripts.helpful_scripts import get_lottery
+from scripts.indexer import DB_PATH, connect, get_round_players, get_round_winner
+from typing import NamedTuple
+import math
+import os
+import time
+import numpy as np
+
+# Fairness of winner selection, mirroring LotteryV2 math exactly:
+# 1. Winning ticket is randomWords[0] % ticketsCount (uint256 modulo), winner is the entry whose cumulative "ticketsEnd" is the first one above it,
+#    so player with more tickets (or more entries) has proportionally better odds
+# 2. Prize is prizePool * 19 / 20 and commission prizePool * 1 / 20, both rounded down, the rest (dust) stays in contract
+# Simulator draws millions of uint256 words in batches and compares observed wins with expected ones (chi-square test),
+# verifier replays history saved by "scripts/indexer.py" and checks every recorded winner against its random word.
+#
+# Usage: brownie run scripts/fairness.py main 1000000 "1,1,3,5"
+
+SIMULATED_ROUNDS = 1000000
+TICKETS = [1, 1, 2, 5, 10]
+BATCH_SIZE = 1000000
+# Entry fee used to turn tickets into prize pool, same as 50 USD at 2000 USD/ETH
+ENTRY_FEE = 25 * 10 ** 15
+# uint256 word is kept as 8 limbs of 32 bits (most significant first), so modulo of numbers below 2 ** 32 fits into uint64
+WORD_LIMBS = 8
+LIMB_BITS = 32
+MAX_TICKETS = 2 ** 32
+
+
+class FairnessReport(NamedTuple):
+    rounds: int
+    # Per entry (position in round), wins counted by simulation and expected from ticket shares
+    wins: np.ndarray
+    expected_wins: np.ndarray
+    chi_square: float
+    degrees_of_freedom: int
+    p_value: float
+    # Largest |observed - expected| / expected over entries
+    max_relative_deviation: float
+    draws_per_second: float
+    # Wei won by every entry and collected as commission in all rounds, "dust" is what division left in contract
+    winnings: np.ndarray
+    commission: int
+    dust: int
+
+
+class VerificationResult(NamedTuple):
+    checked: int
+    # (round_id, recorded_winner, expected_winner) for rounds where they differ
+    mismatches: list
+
+
+def main(rounds = None, tickets = None):
+    rounds = int(rounds) if rounds else SIMULATED_ROUNDS
+    tickets = [int(count) for count in tickets.split(",")] if tickets else TICKETS
+    report = simulate_fixed_round(tickets, rounds)
+    print(f'Simulated Rounds: {report.rounds} ({report.draws_per_second:,.0f} Draws Per Second)')
+    for index, (count, wins, expected) in enumerate(zip(tickets, report.wins, report.expected_wins)):
+        print(f'Entry {index} With {count} Tickets: Won {wins} Times, Expected {expected:.1f}')
+    print(f'Chi-Square: {report.chi_square:.2f} ({report.degrees_of_freedom} Degrees Of Freedom), P-Value: {report.p_value:.4f}')
+    print(f'Max Relative Deviation: {report.max_relative_deviation:.4%}')
+    if os.path.exists(DB_PATH):
+        connection = connect(DB_PATH)
+        result = verify_history(connection, get_lottery().address)
+        print(f'Verified Rounds: {result.checked}, Mismatches: {len(result.mismatches)}')
+        for round_id, recorded_winner, expected_winner in result.mismatches:
+            print(f'WARNING: Round {round_id} Winner Is {recorded_winner}, Expected {expected_winner}!')
+
+
+def random_words(rng, count):
+    # Uniform uint256 words as (count, 8) array of 32 bit limbs
+    return rng.integers(0, 2 ** LIMB_BITS, size=(count, WORD_LIMBS), dtype=np.uint64)
+
+
+def words_to_limbs(words):
+    # Python ints (e.g. random words from chain) to limbs
+    return np.array(
+        [[(word >> (LIMB_BITS * (WORD_LIMBS - 1 - limb))) & (2 ** LIMB_BITS - 1) for limb in range(WORD_LIMBS)] for word in words],
+        dtype=np.uint64,
+    ).reshape(-1, WORD_LIMBS)
+
+
+def limbs_to_words(limbs):
+    return [sum(int(limb) << (LIMB_BITS * (WORD_LIMBS - 1 - index)) for index, limb in enumerate(row)) for row in limbs]
+
+
+def uint256_mod(limbs, modulus):
+    # word % modulus for every row, "modulus" is a number or array (one per row) below 2 ** 32
+    # Horner's scheme: remainder < 2 ** 32, so remainder * 2 ** 32 + limb never overflows uint64
+    modulus = np.asarray(modulus, dtype=np.uint64)
+    if np.any(modulus == 0) or np.any(modulus >= MAX_TICKETS):
+        raise ValueError(f'Modulus has to be between 1 and {MAX_TICKETS - 1}')
+    remainder = np.zeros(limbs.shape[0], dtype=np.uint64)
+    for limb in range(WORD_LIMBS):
+        remainder = ((remainder << np.uint64(LIMB_BITS)) + limbs[:, limb]) % modulus
+    return remainder
+
+
+def pick_entries(tickets_ends, winning_tickets):
+    # Same as "findEntry": first entry whose cumulative "ticketsEnd" is above winning ticket
+    return np.searchsorted(tickets_ends, winning_tickets, side="right")
+
+
+def split_prize_pool(prize_pool):
+    # (prize, commission, dust) like "fulfillRandomWords", prizePool * 19 would overflow uint64 for pools above ~0.97e18 wei,
+    # so we use prizePool = 20 * quotient + remainder: prizePool * 19 / 20 = 19 * quotient + remainder * 19 / 20
+    quotient, remainder = divmod(prize_pool, 20)
+    prize = 19 * quotient + (remainder * 19) // 20
+    commission = quotient + remainder // 20
+    return prize, commission, prize_pool - prize - commission
+
+
+def simulate_fixed_round(tickets, rounds=SIMULATED_ROUNDS, seed=None, batch_size=BATCH_SIZE, entry_fee=ENTRY_FEE):
+    # Same entries ("tickets" bought by every entry, in purchase order) are played "rounds" times
+    rng = np.random.default_rng(seed)
+    tickets = np.asarray(tickets, dtype=np.uint64)
+    tickets_ends = np.cumsum(tickets)
+    tickets_count = int(tickets_ends[-1])
+    wins = np.zeros(len(tickets), dtype=np.int64)
+    started = time.perf_counter()
+    for batch_start in range(0, rounds, batch_size):
+        batch = min(batch_size, rounds - batch_start)
+        winning_tickets = uint256_mod(random_words(rng, batch), tickets_count)
+        wins += np.bincount(pick_entries(tickets_ends, winning_tickets), minlength=len(tickets))
+    elapsed = time.perf_counter() - started
+    expected_wins = tickets.astype(np.float64) / tickets_count * rounds
+    # Prize pool is the same in every round, Python ints keep wei exact
+    prize, commission, dust = split_prize_pool(tickets_count * entry_fee)
+    return FairnessReport(
+        rounds=rounds,
+        wins=wins,
+        expected_wins=expected_wins,
+        **chi_square_test(wins, expected_wins),
+        draws_per_second=rounds / elapsed if elapsed > 0 else float("inf"),
+        winnings=np.array([int(count) * prize for count in wins], dtype=object),
+        commission=rounds * commission,
+        dust=rounds * dust,
+    )
+
+
+def simulate_random_rounds(rounds, max_players, max_tickets, seed=None, batch_size=BATCH_SIZE):
+    # Every round has random number of entries (1..max_players) with random tickets (1..max_tickets) each,
+    # wins and expectations are collected per entry position, so position in purchase order must not matter
+    rng = np.random.default_rng(seed)
+    wins = np.zeros(max_players, dtype=np.int64)
+    expected_wins = np.zeros(max_players, dtype=np.float64)
+    started = time.perf_counter()
+    for batch_start in range(0, rounds, batch_size):
+        batch = min(batch_size, rounds - batch_start)
+        players = rng.integers(1, max_players + 1, size=batch)
+        # Missing entries get 0 tickets, their "ticketsEnd" equals round total, so they can never be picked
+        tickets = rng.integers(1, max_tickets + 1, size=(batch, max_players), dtype=np.uint64)
+        tickets[np.arange(max_players) >= players[:, None]] = 0
+        tickets_ends = np.cumsum(tickets, axis=1)
+        tickets_count = tickets_ends[:, -1]
+        winning_tickets = uint256_mod(random_words(rng, batch), tickets_count)
+        # One sorted array for all rounds of batch, every round is shifted above the previous one
+        offsets = np.arange(batch, dtype=np.uint64) * np.uint64(max_players * max_tickets)
+        flat_ends = (tickets_ends + offsets[:, None]).ravel()
+        entries = pick_entries(flat_ends, winning_tickets + offsets) - np.arange(batch) * max_players
+        wins += np.bincount(entries, minlength=max_players)
+        expected_wins += (tickets / tickets_count[:, None]).sum(axis=0)
+    elapsed = time.perf_counter() - started
+    return FairnessReport(
+        rounds=rounds,
+        wins=wins,
+        expected_wins=expected_wins,
+        **chi_square_test(wins, expected_wins),
+        draws_per_second=rounds / elapsed if elapsed > 0 else float("inf"),
+        winnings=np.zeros(max_players, dtype=object),
+        commission=0,
+        dust=0,
+    )
+
+
+def chi_square_test(wins, expected_wins):
+    observed = wins[expected_wins > 0]
+    expected = expected_wins[expected_wins > 0]
+    chi_square = float(((observed - expected) ** 2 / expected).sum())
+    degrees_of_freedom = max(len(expected) - 1, 1)
+    return {
+        "chi_square": chi_square,
+        "degrees_of_freedom": degrees_of_freedom,
+        "p_value": chi_square_p_value(chi_square, degrees_of_freedom),
+        "max_relative_deviation": float((np.abs(observed - expected) / expected).max()),
+    }
+
+
+def chi_square_p_value(chi_square, degrees_of_freedom):
+    # Wilson-Hilferty approximation, good enough without SciPy for a few degrees of freedom and more
+    k = degrees_of_freedom
+    z = ((chi_square / k) ** (1 / 3) - (1 - 2 / (9 * k))) / math.sqrt(2 / (9 * k))
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def expected_winner(entries, random_word):
+    # "entries" are (player, tickets) in purchase order, exact Python int arithmetic as reference for the vectorized version
+    tickets_ends = np.cumsum([tickets for player, tickets in entries])
+    winning_ticket = random_word % int(tickets_ends[-1])
+    return entries[int(pick_entries(tickets_ends, winning_ticket))][0]
+
+
+def verify_history(connection, lottery_address, round_ids=None):
+    # Replays every indexed round: random word from "WinnerPicked" has to pick the recorded winner from "LotteryEntrance" entries
+    if round_ids is None:
+        round_ids = [row[0] for row in connection.execute("SELECT round_id FROM winners WHERE lottery = ? ORDER BY round_id", (lottery_address,))]
+    mismatches = []
+    checked = 0
+    for round_id in round_ids:
+        winner = get_round_winner(connection, lottery_address, round_id)
+        entries = get_round_players(connection, lottery_address, round_id)
+        if winner is None or not entries:
+            continue
+        recorded_winner, random_word, block_number = winner
+        checked += 1
+        expected = expected_winner(entries, int(random_word))
+        if expected != recorded_winner:
+            mismatches.append((round_id, recorded_winner, expected))
+    return VerificationResult(checked, mismatches)
@@ -0,0 +1,83 @@
+from scripts.helpful_scripts import get_contract
+from scripts.multicall import multicall
+import threading
+import time
+
+# Client side entry fee cache, so scripts don't call "getEntryFee" before every ticket.
+# 1. Fee is never trusted for more than "max_age" seconds
+# 2. With price snapshots fee can't change until snapshot gets stale, so it is trusted until then (still at most "max_age")
+# 3. Without price snapshots on-chain price changes with every feed update, so price feed round is kept with the fee
+#    and checked on every "get" (one call to price feed), fee is read again as soon as feed has new answer
+# 4. Round id is kept with the fee, callers which know current round pass it in,
+#    so round started by another process (with new snapshot) isn't priced with fee of the previous one
+# 5. Scripts invalidate fee of lottery whenever they start new round
+
+ENTRY_FEE_MAX_AGE = 15
+
+
+class EntryFeeCache:
+    def __init__(self, max_age=ENTRY_FEE_MAX_AGE):
+        self.max_age = max_age
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, lottery, round_id=None):
+        # "round_id" is current round known to caller, fee cached for other round is read again
+        with self._lock:
+            entry = self._entries.get(lottery.address)
+        if entry is not None and time.monotonic() < entry["expires_at"] and round_id in [None, entry["round_id"]] and self._price_unchanged(entry):
+            return entry["fee"]
+        fee, valid_for, current_round, price_round = self._read(lottery)
+        with self._lock:
+            self._entries[lottery.address] = {
+                "fee": fee,
+                "round_id": current_round,
+                "price_round": price_round,
+                "expires_at": time.monotonic() + min(valid_for, self.max_age),
+            }
+        return fee
+
+    def _price_unchanged(self, entry):
+        # Fee priced from snapshot has no price feed round, it can't change before entry expires
+        if entry["price_round"] is None:
+            return True
+        feed_round, answer, started_at, updated_at, answered_in_round = get_contract("eth_usd_price_feed").latestRoundData()
+        return feed_round == entry["price_round"]
+
+    def invalidate(self, lottery=None):
+        # Has to be called when we know that round or price changed, without lottery whole cache is cleared
+        with self._lock:
+            if lottery is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(lottery.address, None)
+
+    def _read(self, lottery):
+        # Fee, round, price snapshot, price feed round and chain time are read together, so they describe the same block
+        # Returns (fee, seconds fee stays valid, round id, price feed round or None when fee comes from snapshot)
+        multicall3 = get_contract("multicall3")
+        block_number, (fee, current_round, price_snapshot, latest_round_data, block_timestamp) = multicall(
+            [
+                (lottery.getEntryFee, ()),
+                (lottery.getCurrentRoundId, ()),
+                (lottery.getPriceSnapshot, ()),
+                (get_contract("eth_usd_price_feed").latestRoundData, ()),
+                (multicall3.getCurrentBlockTimestamp, ()),
+            ]
+        )
+        if fee is None:
+            # "getEntryFee" reverts when lottery is not open
+            raise Exception(f'Lottery {lottery.address} is not open, entry fee is unavailable')
+        price, updated_at, refresh_interval = price_snapshot
+        # Stale snapshot is refreshed by next ticket from price feed, so until then fee follows price feed
+        if refresh_interval == 0 or updated_at + refresh_interval <= block_timestamp:
+            return fee, self.max_age, current_round, latest_round_data[0]
+        return fee, updated_at + refresh_interval - block_timestamp, current_round, None
+
+
+# Shared cache used by scripts
+entry_fee_cache = EntryFeeCache()
+
+
+def get_entry_fee(lottery, round_id=None):
+    return entry_fee_cache.get(lottery, round_id)
@@ -1,5 +1,7 @@
 
-from brownie import Contract, network, config, accounts, MockV3Aggregator, VRFCoordinatorV2Mock, LinkToken
+from brownie import Contract, network, config, accounts, chain, web3, MockV3Aggregator, VRFCoordinatorV2Mock, LinkToken, Multicall3, LotteryV2
+import json
+import os
 
 LOCAL_BLOCKCHAIN_ENVIRONMENTS = ["development", "ganache-local"]
 FORKED_LOCAL_ENVIRONMENTS = ["mainnet-fork-dev"]
@@ -13,48 +15,101 @@ BASE_FEE = 250000000000000000 # 0.25 is this the premium in LINK?
 GAS_PRICE_LINK = 1e9 # link per gas, is this the gas lane? // 0.000000001 LINK per gas
 FUND_AMOUNT = 1e18 # 1 ETH / 1 LINK
 
+# LotteryV2.LotteryState values
+LOTTERY_OPEN = 0
+LOTTERY_CALCULATING = 1
+LOTTERY_CLOSED = 2
+
 # We have to map contract type
 contract_to_mock = {
     "eth_usd_price_feed": MockV3Aggregator,
     "vrf_coordinator_v2": VRFCoordinatorV2Mock,
-    "link_token": LinkToken
+    "link_token": LinkToken,
+    "multicall3": Multicall3
 }
 
+# Resolved contracts and accounts, cached per network: {network_name: {name: object}}
+_contract_cache = {}
+_account_cache = {}
+
 # Added for testing purposes
 def main():
     deploy_mocks()
     print(f'{get_contract("eth_usd_price_feed").address}')
     print(f'{get_contract("vrf_coordinator_v2").address}')
     print(f'{get_contract("link_token").address}')
+    print(f'{get_contract("multicall3").address}')
 
 
 def get_account(index = None, id = None):
     # If index was passed we do below
     if index:
         return accounts[index]
-    # If id was passed we do below
+    active_network = network.show_active()
+    network_accounts = _account_cache.setdefault(active_network, {})
+    # If id was passed we do below, loaded accounts are cached so we are asked for password only once
     if id:
-        return accounts.load(id)
+        if id not in network_accounts:
+            network_accounts[id] = accounts.load(id)
+        return network_accounts[id]
     # Shows networks in "development" tab or named "ganache-local"
-    if(network.show_active() in LOCAL_BLOCKCHAIN_ENVIRONMENTS or network.show_active() in FORKED_LOCAL_ENVIRONMENTS):
+    if(active_network in LOCAL_BLOCKCHAIN_ENVIRONMENTS or active_network in FORKED_LOCAL_ENVIRONMENTS):
         return accounts[0]
     # Below will be our default, so if above won't be picked we will get below
-    return accounts.add(config["wallets"]["from_key"])
+    if "from_key" not in network_accounts:
+        network_accounts["from_key"] = accounts.add(config["wallets"]["from_key"])
+    return network_accounts["from_key"]
 
 
 def get_contract(contract_name):
+    active_network = network.show_active()
+    network_contracts = _contract_cache.setdefault(active_network, {})
+    contract = network_contracts.get(contract_name)
+    if contract is not None and _is_current(contract_name, contract):
+        return contract
+    contract = _resolve_contract(contract_name, active_network)
+    network_contracts[contract_name] = contract
+    return contract
+
+
+def invalidate_cache(contract_name = None, network_name = None):
+    # Has to be called after redeploying contracts, so next "get_contract" resolves them again
+    # Without arguments whole cache is cleared
+    networks_to_clear = [network_name] if network_name else list(_contract_cache.keys())
+    for name in networks_to_clear:
+        if contract_name is None:
+            _contract_cache.pop(name, None)
+            _account_cache.pop(name, None)
+        else:
+            _contract_cache.get(name, {}).pop(contract_name, None)
+
+
+def _is_current(contract_name, contract):
+    # On local blockchain mocks can be redeployed or removed by reverting chain, so we check if cached mock is still the latest one
+    if network.show_active() in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
+        contract_type = contract_to_mock[contract_name]
+        return len(contract_type) > 0 and contract_type[-1].address == contract.address
+    return True
+
+
+def _resolve_contract(contract_name, active_network):
     contract_type = contract_to_mock[contract_name]
     # Checking below if we are on a local blockchain
-    if network.show_active() in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
+    if active_network in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
         # Checking if one of above contracts are even deployed (if MockV3Aggregator.length > 0 this mean mockV3 has been deployed and its deploy counter is bigger than 0)
         if len(contract_type) <= 0:
-            deploy_mocks()
+            # Mocks deployed by previous process can be still alive on persistent local chain like "ganache-local"
+            registered_address = get_registered_address(contract_name)
+            if registered_address is not None:
+                contract_type.at(registered_address)
+            else:
+                deploy_mocks()
         # Getting recently deployed mock contract address
         # If we do not give index, so call below as "contract_type" it will throw something like <brownie.network.contract.ContractContainer object at 0x000002577D7DA730>,
         # which is container "number", which contain that whole contract, so it's "address" and ABI with all details that contract has.
         contract = contract_type[-1]
     else:
-        contract_address = config["networks"][network.show_active()][contract_name]
+        contract_address = config["networks"][active_network][contract_name]
         # We need "address" and "ABI" (We will get "ABI" from MockV3Aggregator)
         # We will be getting Contract from it's ABI from package from brownie called "Contract"
         # MockV3Aggregator got attributes as "_name" and "abi"
@@ -62,6 +117,67 @@ def get_contract(contract_name):
     return contract
 
 
+def lottery_constructor_args(subId):
+    return (
+        get_contract("eth_usd_price_feed").address,
+        get_contract("vrf_coordinator_v2").address,
+        config["networks"][network.show_active()]["gasLane"],
+        subId,
+        config["networks"][network.show_active()]["callbackGasLimit"],
+    )
+
+
+def get_lottery():
+    # Latest lottery deployed by this process or the one saved in address registry by previous run
+    if len(LotteryV2) == 0:
+        registered_address = get_registered_address("lottery")
+        if registered_address is not None:
+            return LotteryV2.at(registered_address)
+    return LotteryV2[-1]
+
+
+def _registry_path():
+    # Registry is optional, it is enabled by "ADDRESS_REGISTRY" env variable or "address_registry" key in "brownie-config.yaml"
+    return os.getenv("ADDRESS_REGISTRY") or config.get("address_registry")
+
+
+def _load_registry():
+    path = _registry_path()
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as registry_file:
+        return json.load(registry_file)
+
+
+def register_address(name, address):
+    # Saving address of deployed contract, so next process can find it without deploying it again
+    path = _registry_path()
+    if not path:
+        return
+    registry = _load_registry()
+    network_entry = registry.setdefault(network.show_active(), {"chainId": chain.id, "contracts": {}})
+    # Chain behind network name has changed (e.g. new ganache instance), so old addresses are useless
+    if network_entry["chainId"] != chain.id:
+        network_entry.update({"chainId": chain.id, "contracts": {}})
+    network_entry["contracts"][name] = str(address)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as registry_file:
+        json.dump(registry, registry_file, indent=4)
+
+
+def get_registered_address(name):
+    network_entry = _load_registry().get(network.show_active())
+    if network_entry is None or network_entry["chainId"] != chain.id:
+        return None
+    address = network_entry["contracts"].get(name)
+    # Local chain could have been restarted, so we make sure there is still contract under this address
+    if address is None or len(web3.eth.get_code(address)) == 0:
+        return None
+    return address
+
+
 def deploy_mocks():
     print(f'The active network is {network.show_active()}')
     print("Deploying Mocks...")
@@ -72,4 +188,11 @@ def deploy_mocks():
         LinkToken.deploy({"from": get_account()})
     if len(VRFCoordinatorV2Mock) <= 0:
         VRFCoordinatorV2Mock.deploy(BASE_FEE, GAS_PRICE_LINK, {"from": get_account()})
+    # Live networks already have Multicall3, locally we need to deploy it ourselves
+    if len(Multicall3) <= 0:
+        Multicall3.deploy({"from": get_account()})
+    # Dropping cached handles of previous mocks and saving new addresses
+    for contract_name, contract_type in contract_to_mock.items():
+        invalidate_cache(contract_name, network.show_active())
+        register_address(contract_name, contract_type[-1].address)
     print("Mocks Deployed!")
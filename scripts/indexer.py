@@ -0,0 +1,212 @@
+from scripts.helpful_scripts import get_contract, get_lottery
+from brownie import web3
+import os
+import sqlite3
+import time
+
+# Incremental event indexer, keeps lottery history in local SQLite database:
+# 1. Events are read in block-range chunks, cursor (last indexed block) is saved with every chunk
+# 2. On every run we rewind "confirmations" blocks behind cursor, drop rows indexed from them and index them again,
+#    so events removed by chain reorganization disappear from database
+# 3. Coordinator "RandomWordsFulfilled" events are kept only for requests sent by indexed lottery
+# 4. With "follow" argument indexer keeps tailing the chain, new blocks are indexed every FOLLOW_INTERVAL seconds
+#
+# Usage: brownie run scripts/indexer.py (one run up to current block)
+#        brownie run scripts/indexer.py main 1 (any argument keeps following new blocks until Ctrl+C)
+
+DB_PATH = os.path.join("reports", "lottery_index.db")
+CHUNK_SIZE = 2000
+CONFIRMATIONS = 12
+FOLLOW_INTERVAL = 15
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cursors (
+    name TEXT PRIMARY KEY,
+    block_number INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    lottery TEXT NOT NULL,
+    round_id INTEGER NOT NULL,
+    player TEXT NOT NULL,
+    tickets INTEGER NOT NULL,
+    block_number INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    PRIMARY KEY (tx_hash, log_index)
+);
+CREATE TABLE IF NOT EXISTS requests (
+    lottery TEXT NOT NULL,
+    request_id TEXT NOT NULL,
+    round_id INTEGER NOT NULL,
+    block_number INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    PRIMARY KEY (tx_hash, log_index)
+);
+CREATE TABLE IF NOT EXISTS winners (
+    lottery TEXT NOT NULL,
+    round_id INTEGER NOT NULL,
+    winner TEXT NOT NULL,
+    random_word TEXT NOT NULL,
+    block_number INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    PRIMARY KEY (tx_hash, log_index)
+);
+CREATE TABLE IF NOT EXISTS fulfillments (
+    lottery TEXT NOT NULL,
+    request_id TEXT NOT NULL,
+    output_seed TEXT NOT NULL,
+    payment TEXT NOT NULL,
+    success INTEGER NOT NULL,
+    block_number INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    PRIMARY KEY (tx_hash, log_index)
+);
+CREATE INDEX IF NOT EXISTS entries_by_player ON entries (player);
+CREATE INDEX IF NOT EXISTS entries_by_round ON entries (lottery, round_id);
+CREATE INDEX IF NOT EXISTS requests_by_request_id ON requests (request_id);
+CREATE INDEX IF NOT EXISTS requests_by_round ON requests (lottery, round_id);
+CREATE INDEX IF NOT EXISTS winners_by_round ON winners (lottery, round_id);
+CREATE INDEX IF NOT EXISTS winners_by_player ON winners (winner);
+CREATE INDEX IF NOT EXISTS fulfillments_by_request_id ON fulfillments (request_id);
+"""
+
+# Tables with rows that belong to single lottery and come from blocks that can be reorganized
+EVENT_TABLES = ["entries", "requests", "winners", "fulfillments"]
+
+
+def main(follow = None):
+    lottery = get_lottery()
+    vrf_coordinator = get_contract("vrf_coordinator_v2")
+    indexed_to = index_lottery(lottery, vrf_coordinator)
+    print(f'Lottery {lottery.address} Indexed Up To Block {indexed_to}')
+    if not follow:
+        return
+    print("Following New Blocks, Press Ctrl+C To Stop...")
+    try:
+        while True:
+            time.sleep(FOLLOW_INTERVAL)
+            # Every run also re-indexes confirmation window, so reorganized blocks are fixed while following
+            last_indexed, indexed_to = indexed_to, index_lottery(lottery, vrf_coordinator)
+            if indexed_to != last_indexed:
+                print(f'Lottery {lottery.address} Indexed Up To Block {indexed_to}')
+    except KeyboardInterrupt:
+        print(f'Stopped At Block {indexed_to}')
+
+
+def connect(db_path=DB_PATH):
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(db_path)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def index_lottery(lottery, vrf_coordinator, db_path=DB_PATH, start_block=0, chunk_size=CHUNK_SIZE, confirmations=CONFIRMATIONS):
+    # Returns last indexed block
+    connection = connect(db_path)
+    try:
+        cursor_name = f'{lottery.address}:{vrf_coordinator.address}'
+        head = web3.eth.block_number
+        last_indexed = get_cursor(connection, cursor_name)
+        from_block = start_block if last_indexed is None else max(start_block, last_indexed - confirmations + 1)
+        with connection:
+            rewind(connection, lottery.address, from_block)
+            set_cursor(connection, cursor_name, from_block - 1)
+        for chunk_start in range(from_block, head + 1, chunk_size):
+            chunk_end = min(chunk_start + chunk_size - 1, head)
+            # Whole chunk and its cursor are committed together, so interrupted run never leaves half of chunk behind
+            with connection:
+                index_chunk(connection, lottery, vrf_coordinator, chunk_start, chunk_end)
+                set_cursor(connection, cursor_name, chunk_end)
+        return get_cursor(connection, cursor_name)
+    finally:
+        connection.close()
+
+
+def index_chunk(connection, lottery, vrf_coordinator, from_block, to_block):
+    address = lottery.address
+    for event in lottery.events.get_sequence(from_block, to_block, "LotteryEntrance"):
+        insert(connection, "entries", (address, event.args["roundId"], event.args["player"], event.args["tickets"]) + location(event))
+    for event in lottery.events.get_sequence(from_block, to_block, "RequestedLotteryWinner"):
+        insert(connection, "requests", (address, str(event.args["requestId"]), event.args["roundId"]) + location(event))
+    for event in lottery.events.get_sequence(from_block, to_block, "WinnerPicked"):
+        insert(connection, "winners", (address, event.args["roundId"], event.args["recentWinner"], str(event.args["randomWord"])) + location(event))
+    # Coordinator is shared with other consumers, so we keep only fulfillments of our requests (request is always indexed before its fulfillment)
+    for event in vrf_coordinator.events.get_sequence(from_block, to_block, "RandomWordsFulfilled"):
+        request_id = str(event.args["requestId"])
+        if connection.execute("SELECT 1 FROM requests WHERE lottery = ? AND request_id = ?", (address, request_id)).fetchone() is None:
+            continue
+        row = (address, request_id, str(event.args["outputSeed"]), str(event.args["payment"]), int(event.args["success"]))
+        insert(connection, "fulfillments", row + location(event))
+
+
+def location(event):
+    return (event.blockNumber, event.transactionHash.hex(), event.logIndex)
+
+
+def insert(connection, table, row):
+    placeholders = ", ".join("?" for _ in row)
+    connection.execute(f'INSERT OR REPLACE INTO {table} VALUES ({placeholders})', row)
+
+
+def rewind(connection, lottery_address, from_block):
+    for table in EVENT_TABLES:
+        connection.execute(f'DELETE FROM {table} WHERE lottery = ? AND block_number >= ?', (lottery_address, from_block))
+
+
+def get_cursor(connection, name):
+    row = connection.execute("SELECT block_number FROM cursors WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def set_cursor(connection, name, block_number):
+    connection.execute("INSERT OR REPLACE INTO cursors (name, block_number) VALUES (?, ?)", (name, block_number))
+
+
+# Below queries are answered from local database instead of "getPlayers"/"getWinner" calls
+
+
+def get_player_history(connection, player):
+    # Every purchase of given player together with winner of that round (None if round is not finished yet)
+    return connection.execute(
+        """
+        SELECT entries.lottery, entries.round_id, entries.tickets, entries.block_number, winners.winner
+        FROM entries
+        LEFT JOIN winners ON winners.lottery = entries.lottery AND winners.round_id = entries.round_id
+        WHERE entries.player = ?
+        ORDER BY entries.block_number, entries.log_index
+        """,
+        (player,),
+    ).fetchall()
+
+
+def get_round_players(connection, lottery_address, round_id):
+    # Players with ticket counts in purchase order, same as on-chain entries of this round
+    return connection.execute(
+        "SELECT player, tickets FROM entries WHERE lottery = ? AND round_id = ? ORDER BY block_number, log_index",
+        (lottery_address, round_id),
+    ).fetchall()
+
+
+def get_round_winner(connection, lottery_address, round_id):
+    return connection.execute(
+        "SELECT winner, random_word, block_number FROM winners WHERE lottery = ? AND round_id = ?",
+        (lottery_address, round_id),
+    ).fetchone()
+
+
+def get_request(connection, request_id):
+    # Request with its fulfillment (None if not fulfilled yet)
+    return connection.execute(
+        """
+        SELECT requests.lottery, requests.round_id, requests.block_number, fulfillments.success, fulfillments.block_number
+        FROM requests
+        LEFT JOIN fulfillments ON fulfillments.lottery = requests.lottery AND fulfillments.request_id = requests.request_id
+        WHERE requests.request_id = ?
+        """,
+        (str(request_id),),
+    ).fetchall()
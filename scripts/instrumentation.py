@@ -0,0 +1,270 @@
+from scripts.helpful_scripts import get_account, get_contract, LOCAL_BLOCKCHAIN_ENVIRONMENTS, FUND_AMOUNT
+from scripts.waiters import wait_for_confirmation
+from scripts.rpc_tracking import track_rpc_requests
+from brownie import network, accounts
+from brownie.network.contract import _ContractMethod
+import json
+import os
+import threading
+
+# Recording gas and latency of every contract transaction and call made while instrumentation is active:
+# 1. Brownie contract methods are patched, so handles from "get_contract", "LotteryV2" deployments and scripts are all covered
+# 2. JSON-RPC requests sent by the calling thread are timed by web3 middleware, "rpc_seconds" is time spent talking to the node,
+#    "confirmation_seconds" is time from broadcasting transaction until its receipt was first returned by the node
+# 3. Transactions sent without waiting ("required_confs": 0) are followed in background until they are confirmed
+# Results can be saved as JSON report and as Prometheus text format.
+#
+# Usage: brownie run scripts/instrumentation.py (plays lottery round with instrumentation on)
+#        brownie run scripts/instrumentation.py update_gas_baselines (measures gas baselines on development chain)
+
+REPORT_PATH = os.path.join("reports", "instrumentation.json")
+PROMETHEUS_PATH = os.path.join("reports", "instrumentation.prom")
+GAS_BASELINES_PATH = os.path.join("tests", "gas_baselines.json")
+# Measured gas can be this much above baseline before it counts as regression
+GAS_TOLERANCE = 0.05
+# Rounds played when gas baselines are measured and checked, purchases are (account index, tickets)
+GAS_BASELINE_ROUNDS = [
+    [(1, 1), (0, 3)],
+    [(1, 1), (2, 1), (3, 1), (0, 3)],
+]
+# Functions whose gas is kept in baselines file, values are only ever written from measurements ("update_gas_baselines")
+GAS_BASELINE_FUNCTIONS = [
+    "LotteryV2.startLottery",
+    "LotteryV2.buyTicket",
+    "LotteryV2.buyTickets",
+    "LotteryV2.pickWinner",
+    "VRFCoordinatorV2Mock.fulfillRandomWords",
+]
+SEND_METHODS = ["eth_sendTransaction", "eth_sendRawTransaction"]
+RECEIPT_METHOD = "eth_getTransactionReceipt"
+
+
+def main():
+    # Imported here, because "run_lottery" doesn't need instrumentation
+    from scripts.run_lottery import run_lottery
+    with Instrumentation() as instrumentation:
+        run_lottery()
+    instrumentation.write_json(os.getenv("INSTRUMENTATION_REPORT", REPORT_PATH))
+    instrumentation.write_prometheus(os.getenv("INSTRUMENTATION_PROMETHEUS", PROMETHEUS_PATH))
+    for function, stats in instrumentation.summary().items():
+        print(f'{function}: {stats["count"]} Calls, Max Gas: {stats["gas_used"]["max"]}, Max RPC Time: {stats["rpc_seconds"]["max"]:.3f}s')
+
+
+def update_gas_baselines(path = None):
+    # Plays GAS_BASELINE_ROUNDS on fresh lottery and stores measured gas, "tests/test_instrumentation.py" fails once gas exceeds it
+    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
+        print("This Function Doesn't Work On TestNet")
+        return
+    # Imported here, because "run_lottery" doesn't need instrumentation
+    from scripts.run_lottery import deploy_lottery_local
+    account = get_account()
+    vrf_coordinator = get_contract("vrf_coordinator_v2")
+    subId = vrf_coordinator.createSubscription({"from": account}).return_value
+    vrf_coordinator.fundSubscription(subId, FUND_AMOUNT, {"from": account})
+    lottery = deploy_lottery_local(subId)
+    vrf_coordinator.addConsumer(subId, lottery.address, {"from": account})
+    with Instrumentation() as instrumentation:
+        for purchases in GAS_BASELINE_ROUNDS:
+            lottery.startLottery({"from": account})
+            for index, tickets in purchases:
+                # Single tickets go through "buyTicket", so both purchase functions get baselines
+                if tickets == 1:
+                    lottery.buyTicket({"from": accounts[index], "value": lottery.getEntryFee()})
+                else:
+                    lottery.buyTickets(tickets, {"from": accounts[index], "value": lottery.getEntryFee() * tickets})
+            requestId = lottery.pickWinner({"from": account}).events["RequestedLotteryWinner"]["requestId"]
+            vrf_coordinator.fulfillRandomWords(requestId, lottery.address, {"from": account})
+    write_gas_baselines(instrumentation, path or GAS_BASELINES_PATH)
+
+
+class Instrumentation:
+    # Only one instrumentation can be active at a time, it is used as context manager
+    def __init__(self):
+        self.records = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._followers = []
+        # perf_counter() times by transaction hash: when it was broadcast and when its receipt showed up (from any thread)
+        self._sent_at = {}
+        self._mined_at = {}
+
+    def __enter__(self):
+        self._original_transact = _ContractMethod.transact
+        self._original_call = _ContractMethod.call
+        instrumentation = self
+
+        def transact(method, *args, **kwargs):
+            return instrumentation._record(method, "transaction", instrumentation._original_transact, args, kwargs)
+
+        def call(method, *args, **kwargs):
+            return instrumentation._record(method, "call", instrumentation._original_call, args, kwargs)
+
+        _ContractMethod.transact = transact
+        _ContractMethod.call = call
+        self._tracking = track_rpc_requests(self._on_request)
+        self._tracking.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            # Waiting for transactions which were still pending, so their gas and confirmation time end up in report
+            for follower in self._followers:
+                follower.join()
+        finally:
+            _ContractMethod.transact = self._original_transact
+            _ContractMethod.call = self._original_call
+            self._tracking.__exit__(*exc_info)
+
+    def _on_request(self, method, params, response, started, finished):
+        active = getattr(self._local, "active", None)
+        if active is not None:
+            active["rpc_seconds"] += finished - started
+        result = response.get("result") if isinstance(response, dict) else None
+        if result is None:
+            return
+        with self._lock:
+            if method in SEND_METHODS:
+                self._sent_at[normalize_hash(result)] = finished
+            elif method == RECEIPT_METHOD:
+                self._mined_at.setdefault(normalize_hash(params[0]), finished)
+
+    def _record(self, method, kind, original, args, kwargs):
+        # Nested contract calls (e.g. call made by brownie while sending transaction) belong to the outer record
+        if getattr(self._local, "active", None) is not None:
+            return original(method, *args, **kwargs)
+        record = {"function": method._name, "kind": kind, "gas_used": None, "rpc_seconds": 0.0, "confirmation_seconds": None, "status": None, "txid": None}
+        active = {"rpc_seconds": 0.0}
+        self._local.active = active
+        try:
+            result = original(method, *args, **kwargs)
+        except Exception:
+            record["status"] = "error"
+            raise
+        finally:
+            self._local.active = None
+            record["rpc_seconds"] = active["rpc_seconds"]
+            with self._lock:
+                self.records.append(record)
+        if kind == "call":
+            record["status"] = "success"
+            return result
+        record["txid"] = result.txid
+        if result.status == -1:
+            follower = threading.Thread(target=self._follow, args=(record, result), daemon=True)
+            follower.start()
+            self._followers.append(follower)
+        else:
+            self._confirmed(record, result)
+        return result
+
+    def _follow(self, record, tx):
+        wait_for_confirmation(tx)
+        self._confirmed(record, tx)
+
+    def _confirmed(self, record, tx):
+        txid = normalize_hash(tx.txid)
+        with self._lock:
+            sent_at = self._sent_at.get(txid)
+            mined_at = self._mined_at.get(txid)
+        if sent_at is not None and mined_at is not None:
+            record["confirmation_seconds"] = mined_at - sent_at
+        record["status"] = "success" if tx.status == 1 else "reverted"
+        record["gas_used"] = tx.gas_used
+
+    def summary(self):
+        # {function: {"count", "errors", "gas_used", "rpc_seconds", "confirmation_seconds"}}, every metric as count/sum/mean/max
+        with self._lock:
+            records = list(self.records)
+        summary = {}
+        for function in sorted({record["function"] for record in records}):
+            function_records = [record for record in records if record["function"] == function]
+            summary[function] = {
+                "kind": function_records[0]["kind"],
+                "count": len(function_records),
+                "errors": len([record for record in function_records if record["status"] in ["error", "reverted"]]),
+            }
+            for metric in ["gas_used", "rpc_seconds", "confirmation_seconds"]:
+                values = [record[metric] for record in function_records if record[metric] is not None]
+                summary[function][metric] = {
+                    "count": len(values),
+                    "sum": sum(values),
+                    "mean": sum(values) / len(values) if values else None,
+                    "max": max(values) if values else None,
+                }
+        return summary
+
+    def write_json(self, path):
+        with self._lock:
+            records = list(self.records)
+        write_file(path, json.dumps({"summary": self.summary(), "records": records}, indent=4))
+        print(f'Instrumentation Report Saved To: {path}')
+
+    def to_prometheus(self):
+        lines = []
+        summary = self.summary()
+        metrics = [
+            ("gas_used", "lottery_contract_gas_used", "Gas used by contract transactions"),
+            ("rpc_seconds", "lottery_contract_rpc_seconds", "Time spent in JSON-RPC requests of contract calls and transactions"),
+            ("confirmation_seconds", "lottery_contract_confirmation_seconds", "Time from broadcasting transaction until it got mined"),
+        ]
+        lines.append("# HELP lottery_contract_calls_total Contract calls and transactions made by scripts")
+        lines.append("# TYPE lottery_contract_calls_total counter")
+        for function, stats in summary.items():
+            lines.append(f'lottery_contract_calls_total{{function="{function}",kind="{stats["kind"]}"}} {stats["count"]}')
+        for metric, name, description in metrics:
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} summary')
+            for function, stats in summary.items():
+                if stats[metric]["count"] == 0:
+                    continue
+                labels = f'{{function="{function}"}}'
+                lines.append(f'{name}_count{labels} {stats[metric]["count"]}')
+                lines.append(f'{name}_sum{labels} {stats[metric]["sum"]}')
+                lines.append(f'{name}_max{labels} {stats[metric]["max"]}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        write_file(path, self.to_prometheus())
+        print(f'Prometheus Metrics Saved To: {path}')
+
+
+def normalize_hash(value):
+    # Transaction hashes come as hex strings or bytes, depending on who is asking
+    return (value if isinstance(value, str) else "0x" + bytes(value).hex()).lower()
+
+
+def write_file(path, content):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as output_file:
+        output_file.write(content)
+
+
+def load_gas_baselines(path=GAS_BASELINES_PATH):
+    with open(path) as baselines_file:
+        return json.load(baselines_file)
+
+
+def check_gas_baselines(instrumentation, baselines, tolerance=GAS_TOLERANCE):
+    # Returns list of (function, max_gas_used, baseline) for functions which used more gas than baseline allows
+    regressions = []
+    summary = instrumentation.summary()
+    for function, baseline in baselines.items():
+        if function not in summary or summary[function]["gas_used"]["max"] is None:
+            continue
+        max_gas_used = summary[function]["gas_used"]["max"]
+        if max_gas_used > baseline * (1 + tolerance):
+            regressions.append((function, max_gas_used, baseline))
+    return regressions
+
+
+def write_gas_baselines(instrumentation, path=GAS_BASELINES_PATH):
+    # Replacing baselines with gas measured now, file is created on first run
+    baselines = load_gas_baselines(path) if os.path.exists(path) else {}
+    summary = instrumentation.summary()
+    for function in GAS_BASELINE_FUNCTIONS:
+        if function in summary and summary[function]["gas_used"]["max"] is not None:
+            baselines[function] = summary[function]["gas_used"]["max"]
+    write_file(path, json.dumps(baselines, indent=4) + "\n")
+    print(f'Gas Baselines Updated In: {path}')
@@ -0,0 +1,224 @@
+from eth_utils import function_abi_to_4byte_selector, to_checksum_address
+from http.client import HTTPConnection, HTTPSConnection
+from urllib.parse import urlparse
+import argparse
+import json
+import os
+import sys
+import time
+
+try:
+    from eth_abi import decode, encode
+except ImportError:
+    # eth-abi < 4
+    from eth_abi import decode_abi as decode, encode_abi as encode
+
+# Read-only lottery status without starting brownie:
+# 1. Only cached ABIs of LotteryV2 and VRFCoordinatorV2Mock are read from "build/contracts", nothing is compiled and no account is loaded
+# 2. All values are fetched with one JSON-RPC batch request over keep-alive connection
+# 3. Addresses come from arguments, address registry or brownie deployment map, subscription from arguments or "brownie-config.yaml"
+#
+# Usage: python scripts/lottery_status.py --rpc http://127.0.0.1:8545 --network ganache-local [--lottery 0x...] [--subscription 1] [--watch 5]
+
+PROJECT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUILD_PATH = os.path.join(PROJECT_PATH, "build")
+DEFAULT_RPC = "http://127.0.0.1:8545"
+RPC_TIMEOUT = 10
+# LotteryV2.LotteryState names
+LOTTERY_STATES = ["OPEN", "CALCULATING", "CLOSED"]
+LOTTERY_CALLS = ["getLotteryState", "getCurrentRoundId", "getPlayersCount", "getTicketsCount", "getWinner", "getEntryFee"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print status of deployed lottery")
+    parser.add_argument("--rpc", default=os.getenv("RPC_URL", DEFAULT_RPC), help="JSON-RPC endpoint (default: RPC_URL env variable or local node)")
+    parser.add_argument("--network", default="development", help="brownie network name used to find addresses")
+    parser.add_argument("--lottery", help="lottery address")
+    parser.add_argument("--coordinator", help="VRF coordinator address")
+    parser.add_argument("--subscription", type=int, help="VRF subscription id")
+    parser.add_argument("--watch", type=float, help="print status again every WATCH seconds")
+    args = parser.parse_args(argv)
+    client = RPCClient(args.rpc)
+    try:
+        lottery = args.lottery or find_address(client, args.network, "lottery", "LotteryV2")
+        if lottery is None:
+            print("Lottery Address Not Found, Pass It With --lottery")
+            return 1
+        coordinator = args.coordinator or find_address(client, args.network, "vrf_coordinator_v2", "VRFCoordinatorV2Mock")
+        subscription = args.subscription if args.subscription is not None else configured_subscription(args.network)
+        while True:
+            started = time.perf_counter()
+            status = get_status(client, lottery, coordinator, subscription)
+            print_status(status, time.perf_counter() - started)
+            if not args.watch:
+                return 0
+            time.sleep(args.watch)
+    finally:
+        client.close()
+
+
+class RPCClient:
+    # JSON-RPC over one keep-alive HTTP connection, reconnected once if node closed it
+    def __init__(self, url, timeout=RPC_TIMEOUT):
+        self.url = urlparse(url)
+        self.timeout = timeout
+        self._connection = None
+        self._next_id = 0
+
+    def _connect(self):
+        connection_type = HTTPSConnection if self.url.scheme == "https" else HTTPConnection
+        return connection_type(self.url.netloc, timeout=self.timeout)
+
+    def _post(self, payload):
+        body = json.dumps(payload)
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        for attempt in range(2):
+            if self._connection is None:
+                self._connection = self._connect()
+            try:
+                self._connection.request("POST", self.url.path or "/", body, headers)
+                response = self._connection.getresponse()
+                return json.loads(response.read())
+            except (ConnectionError, OSError):
+                self.close()
+                if attempt == 1:
+                    raise
+
+    def batch(self, requests):
+        # "requests" is a list of (method, params), returns list of results in the same order, errors give None
+        payload = []
+        for method, params in requests:
+            self._next_id += 1
+            payload.append({"jsonrpc": "2.0", "id": self._next_id, "method": method, "params": params})
+        responses = {response["id"]: response for response in self._post(payload)}
+        return [responses[request["id"]].get("result") for request in payload]
+
+    def request(self, method, params):
+        return self.batch([(method, params)])[0]
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def load_abi(contract_name):
+    with open(os.path.join(BUILD_PATH, "contracts", f'{contract_name}.json')) as build_file:
+        return {entry["name"]: entry for entry in json.load(build_file)["abi"] if entry["type"] == "function"}
+
+
+def output_types(function_abi):
+    return [collapse_type(output) for output in function_abi["outputs"]]
+
+
+def collapse_type(abi_type):
+    # Struct outputs are described as tuples with components
+    if abi_type["type"].startswith("tuple"):
+        return f'({",".join(collapse_type(component) for component in abi_type["components"])}){abi_type["type"][len("tuple"):]}'
+    return abi_type["type"]
+
+
+def encode_call(function_abi, args=()):
+    input_types = [collapse_type(abi_input) for abi_input in function_abi["inputs"]]
+    return "0x" + (function_abi_to_4byte_selector(function_abi) + encode(input_types, list(args))).hex()
+
+
+def decode_result(function_abi, result):
+    # Reverted calls (e.g. "getEntryFee" of closed lottery) come back as None
+    if result is None or result == "0x":
+        return None
+    values = decode(output_types(function_abi), bytes.fromhex(result[2:]))
+    return values[0] if len(values) == 1 else values
+
+
+def get_status(client, lottery, coordinator=None, subscription=None):
+    lottery_abi = load_abi("LotteryV2")
+    calls = [(lottery_abi[name], lottery, ()) for name in LOTTERY_CALLS]
+    if coordinator is not None and subscription is not None:
+        calls.append((load_abi("VRFCoordinatorV2Mock")["getSubscription"], coordinator, (subscription,)))
+    requests = [("eth_blockNumber", []), ("eth_getBalance", [lottery, "latest"])]
+    requests += [("eth_call", [{"to": address, "data": encode_call(function_abi, args)}, "latest"]) for function_abi, address, args in calls]
+    block_number, balance, *results = client.batch(requests)
+    decoded = [decode_result(function_abi, result) for (function_abi, address, args), result in zip(calls, results)]
+    lottery_state, current_round, players_count, tickets_count, winner, entry_fee = decoded[:len(LOTTERY_CALLS)]
+    status = {
+        "block_number": int(block_number, 16),
+        "lottery": to_checksum_address(lottery),
+        "lottery_state": LOTTERY_STATES[lottery_state] if lottery_state is not None else None,
+        "current_round": current_round,
+        "players_count": players_count,
+        "tickets_count": tickets_count,
+        "entry_fee": entry_fee,
+        "balance": int(balance, 16),
+        "last_winner": to_checksum_address(winner) if winner is not None else None,
+        "subscription_balance": None,
+    }
+    if len(decoded) > len(LOTTERY_CALLS) and decoded[-1] is not None:
+        status["subscription_balance"] = decoded[-1][0]
+    return status
+
+
+def print_status(status, elapsed):
+    print(f'Block: {status["block_number"]} (Fetched In {elapsed * 1000:.0f} ms)')
+    print(f'Lottery: {status["lottery"]}')
+    print(f'Lottery State: {status["lottery_state"]}, Round: {status["current_round"]}')
+    print(f'Players Amount: {status["players_count"]}, Tickets Amount: {status["tickets_count"]}')
+    if status["entry_fee"] is not None:
+        print(f'Entry Fee: {status["entry_fee"] / 10**18} ETH')
+    print(f'Lottery Balance: {status["balance"] / 10**18} ETH')
+    print(f'Last Winner: {status["last_winner"]}')
+    if status["subscription_balance"] is not None:
+        print(f'Subscription Balance: {status["subscription_balance"] / 10**18} LINK')
+
+
+def find_address(client, network_name, registry_name, contract_name):
+    # Address registry first (see "helpful_scripts.register_address"), then latest deployment saved by brownie, then "brownie-config.yaml"
+    registry_path = os.getenv("ADDRESS_REGISTRY") or load_config().get("address_registry")
+    if registry_path and os.path.exists(os.path.join(PROJECT_PATH, registry_path)):
+        registry_path = os.path.join(PROJECT_PATH, registry_path)
+        with open(registry_path) as registry_file:
+            network_entry = json.load(registry_file).get(network_name, {})
+        address = network_entry.get("contracts", {}).get(registry_name)
+        if address is not None:
+            return address
+    map_path = os.path.join(BUILD_PATH, "deployments", "map.json")
+    if os.path.exists(map_path):
+        chain_id = str(int(client.request("eth_chainId", []), 16))
+        with open(map_path) as map_file:
+            deployments = json.load(map_file).get(chain_id, {}).get(contract_name, [])
+        if deployments:
+            return deployments[0]
+    return configured_address(network_name, registry_name)
+
+
+# Parsed "brownie-config.yaml", read at most once
+_config_cache = {}
+
+
+def load_config():
+    if "config" not in _config_cache:
+        config_path = os.path.join(PROJECT_PATH, "brownie-config.yaml")
+        _config_cache["config"] = {}
+        if os.path.exists(config_path):
+            # PyYAML comes with brownie, it is imported only when we really need config
+            import yaml
+            with open(config_path) as config_file:
+                _config_cache["config"] = yaml.safe_load(config_file) or {}
+    return _config_cache["config"]
+
+
+def load_network_config(network_name):
+    return (load_config().get("networks") or {}).get(network_name) or {}
+
+
+def configured_address(network_name, name):
+    return load_network_config(network_name).get(name)
+
+
+def configured_subscription(network_name):
+    # 0 means that subscription hasn't been created yet
+    return int(load_network_config(network_name).get("subscriptionId") or 0) or None
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+from scripts.helpful_scripts import get_contract
+from typing import NamedTuple, Optional
+
+# Batched read layer: many view calls are sent as one "eth_call" to Multicall3,
+# so all values come from the same block and we pay for a single RPC round trip.
+
+
+class LotterySnapshot(NamedTuple):
+    block_number: int
+    current_round: int
+    lottery_state: int
+    players_amount: int
+    tickets_count: int
+    # Entry fee can be read only while lottery is open
+    entry_fee: Optional[int]
+    lottery_balance: int
+    winner: str
+    prize: int
+    commission: int
+    success: bool
+    sent: bool
+    # Winner and transfers describe recently finished round, its random word is only in "WinnerPicked" event
+    # Subscription fields are filled only when subId is given
+    subscription_balance: Optional[int] = None
+    request_count: Optional[int] = None
+    subscription_owner: Optional[str] = None
+    consumers: Optional[list] = None
+    # Whole players array is read only on request, big rounds should be streamed with "players.iter_players"
+    players: Optional[list] = None
+
+
+def multicall(calls, block_identifier=None):
+    # "calls" is a list of (contract_method, args) tuples, e.g. [(lottery.getPlayers, ()), (coordinator.getSubscription, (subId,))]
+    # Returns block number at which calls were executed and decoded results, failed calls give None
+    multicall3 = get_contract("multicall3")
+    encoded_calls = [(multicall3.address, False, multicall3.getBlockNumber.encode_input())]
+    for method, args in calls:
+        encoded_calls.append((method._address, True, method.encode_input(*args)))
+    # "aggregate3" is payable, so we have to explicitly ask for "eth_call" instead of transaction
+    results = multicall3.aggregate3.call(encoded_calls, block_identifier=block_identifier)
+    block_number = multicall3.getBlockNumber.decode_output(results[0][1])
+    decoded = []
+    for (method, args), (success, return_data) in zip(calls, results[1:]):
+        decoded.append(method.decode_output(return_data) if success else None)
+    return block_number, decoded
+
+
+def get_lottery_snapshot(lottery, vrf_coordinator=None, subId=None, block_identifier=None, include_players=False):
+    multicall3 = get_contract("multicall3")
+    calls = [
+        (lottery.getCurrentRoundId, ()),
+        (lottery.getLotteryState, ()),
+        (lottery.getPlayersCount, ()),
+        (lottery.getTicketsCount, ()),
+        (lottery.getEntryFee, ()),
+        # "getLotteryBalance" is "onlyOwner", so we read contract balance through Multicall3
+        (multicall3.getEthBalance, (lottery.address,)),
+        (lottery.getWinner, ()),
+        (lottery.getLotteryTransactions, ()),
+    ]
+    with_subscription = vrf_coordinator is not None and subId is not None
+    if with_subscription:
+        calls.append((vrf_coordinator.getSubscription, (subId,)))
+    if include_players:
+        calls.append((lottery.getPlayers, ()))
+    block_number, results = multicall(calls, block_identifier)
+    current_round, lottery_state, players_amount, tickets_count, entry_fee, lottery_balance, winner, transactions = results[:8]
+    prize, commission, success, sent = transactions
+    extra_results = results[8:]
+    subscription = (None, None, None, None)
+    if with_subscription:
+        subscription = extra_results.pop(0) or subscription
+    balance, request_count, owner, consumers = subscription
+    players = list(extra_results.pop(0)[0]) if include_players else None
+    return LotterySnapshot(
+        block_number=block_number,
+        current_round=current_round,
+        lottery_state=lottery_state,
+        players_amount=players_amount,
+        tickets_count=tickets_count,
+        entry_fee=entry_fee,
+        lottery_balance=lottery_balance,
+        winner=winner,
+        prize=prize,
+        commission=commission,
+        success=success,
+        sent=sent,
+        subscription_balance=balance,
+        request_count=request_count,
+        subscription_owner=owner,
+        consumers=list(consumers) if consumers is not None else None,
+        players=players,
+    )
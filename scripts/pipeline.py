@@ -0,0 +1,369 @@
+from scripts.helpful_scripts import get_account, get_contract, lottery_constructor_args, register_address, get_registered_address, LOCAL_BLOCKCHAIN_ENVIRONMENTS, FUND_AMOUNT, LOTTERY_OPEN, LOTTERY_CALCULATING, LOTTERY_CLOSED
+from scripts.multicall import get_lottery_snapshot, multicall
+from scripts.players import iter_players
+from scripts.bulk_purchase import buy_tickets_bulk
+from scripts.fee_cache import entry_fee_cache
+from scripts.waiters import CONFIRMATION_TIMEOUT, FulfillmentFailedError, raise_if_reverted, wait_for_confirmation, wait_for_subscription, wait_for_event, wait_for_request_id, wait_for_winner
+from brownie import convert, exceptions, network, config, accounts, chain, web3, LotteryV2
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NamedTuple, Optional, Tuple
+from web3.exceptions import TimeExhausted, TransactionNotFound
+import json
+import os
+
+# Lottery round split into steps, outputs of every step are saved to checkpoint file, so crashed run can be resumed:
+# 1. Before running a step we look at the chain, if its effect is already there (e.g. lottery is already CALCULATING) it is skipped
+# 2. Transaction hash is saved right after sending, so on restart we wait for that transaction instead of sending it again
+# 3. When a step has to run again, outputs of steps depending on it are dropped, they belong to the previous subscription/lottery/round
+# 4. Read-only steps which don't depend on each other run concurrently
+#
+# Usage: brownie run scripts/run_lottery.py (see "run_lottery"), checkpoint path can be changed with PIPELINE_CHECKPOINT env variable
+
+CHECKPOINT_PATH = os.path.join("build", "lottery_pipeline.json")
+# Subscription is funded again when its balance drops below this amount
+MIN_SUBSCRIPTION_BALANCE = 10 ** 18
+TICKETS_PER_PLAYER = 1
+
+# Steps playing one round, "new_round" drops their outputs so next run starts another round (and checks subscription balance again)
+ROUND_STEPS = ["fund", "start", "buy", "pick_winner", "fulfill"]
+
+
+class Step(NamedTuple):
+    name: str
+    # run(outputs, record) returns outputs of the step, record(**outputs) saves part of them before step finishes,
+    # read-only steps are called just with run(outputs)
+    run: Callable
+    # is_done(outputs, saved) returns outputs of the step if its effect is already on chain, None otherwise
+    is_done: Optional[Callable] = None
+    requires: Tuple[str, ...] = ()
+    # Read-only steps are never skipped nor saved, they are cheap to repeat
+    read_only: bool = False
+
+
+class Checkpoint:
+    # Saved as {network: {"chainId": id, "steps": {step_name: outputs}}}, same layout as address registry
+    def __init__(self, path=None):
+        self.path = path or os.getenv("PIPELINE_CHECKPOINT") or CHECKPOINT_PATH
+        self._data = {}
+        if os.path.exists(self.path):
+            with open(self.path) as checkpoint_file:
+                self._data = json.load(checkpoint_file)
+        network_entry = self._data.setdefault(network.show_active(), {"chainId": chain.id, "steps": {}})
+        # Chain behind network name has changed (e.g. new ganache instance), so old outputs are useless
+        if network_entry["chainId"] != chain.id:
+            network_entry.update({"chainId": chain.id, "steps": {}})
+        self._steps = network_entry["steps"]
+
+    def get(self, step_name):
+        return dict(self._steps.get(step_name, {}))
+
+    def record(self, step_name, **outputs):
+        self._steps.setdefault(step_name, {}).update(outputs)
+        self._save()
+
+    def discard(self, step_names):
+        for step_name in step_names:
+            self._steps.pop(step_name, None)
+        self._save()
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "w") as checkpoint_file:
+            json.dump(self._data, checkpoint_file, indent=4)
+
+
+def run_steps(steps, checkpoint, until=None):
+    # Returns {step_name: outputs}, "until" stops pipeline after given step
+    if until is not None:
+        steps = steps[:[step.name for step in steps].index(until) + 1]
+    outputs = {}
+    pending = list(steps)
+    while pending:
+        ready = [step for step in pending if all(name in outputs for name in step.requires)]
+        if not ready:
+            raise Exception(f'Steps {[step.name for step in pending]} depend on steps which are not in pipeline')
+        reads = [step for step in ready if step.read_only]
+        if reads:
+            with ThreadPoolExecutor(max_workers=len(reads)) as executor:
+                futures = {step.name: executor.submit(step.run, outputs) for step in reads}
+            for name, future in futures.items():
+                outputs[name] = future.result()
+            pending = [step for step in pending if step not in reads]
+            continue
+        # Transactions are sent one by one in pipeline order, so they never compete for nonces
+        step = ready[0]
+        outputs[step.name] = run_step(step, checkpoint, outputs, get_dependents(steps, step.name))
+        pending.remove(step)
+    return outputs
+
+
+def get_dependents(steps, step_name):
+    # Names of steps which depend on given step directly or through other steps
+    dependents = []
+    for step in steps:
+        if any(name == step_name or name in dependents for name in step.requires):
+            dependents.append(step.name)
+    return dependents
+
+
+def run_step(step, checkpoint, outputs, dependents):
+    saved = checkpoint.get(step.name)
+    if "pending_tx" in saved:
+        # Previous run crashed while waiting for this transaction, it can still get mined
+        wait_for_pending_transaction(saved["pending_tx"])
+    done = step.is_done(outputs, saved)
+    if done is not None:
+        print(f'Step "{step.name}" Already Done, Skipping...')
+        checkpoint.record(step.name, **done)
+        return checkpoint.get(step.name)
+    print(f'Running Step "{step.name}"...')
+    checkpoint.discard([step.name, *dependents])
+    result = step.run(outputs, lambda **recorded: checkpoint.record(step.name, **recorded))
+    checkpoint.discard([step.name])
+    checkpoint.record(step.name, **result)
+    return checkpoint.get(step.name)
+
+
+def wait_for_pending_transaction(tx_hash, timeout=CONFIRMATION_TIMEOUT):
+    try:
+        web3.eth.wait_for_transaction_receipt(tx_hash, timeout=timeout)
+    except TimeExhausted:
+        # Dropped or still pending, chain state will tell if step has to be repeated
+        print(f'Transaction {tx_hash} Is Still Not Mined')
+
+
+def get_pending_receipt(saved):
+    # Receipt of transaction saved by crashed run, None if it hasn't been mined or it reverted
+    if "pending_tx" not in saved:
+        return None
+    try:
+        receipt = web3.eth.get_transaction_receipt(saved["pending_tx"])
+    except TransactionNotFound:
+        return None
+    return receipt if receipt.status == 1 else None
+
+
+def send_transaction(method, args, sender, record):
+    # Transaction hash is saved before we start waiting for it
+    tx = method(*args, {"from": sender, "required_confs": 0})
+    record(pending_tx=tx.txid)
+    wait_for_confirmation(tx)
+    raise_if_reverted(tx, "Transaction")
+    return tx
+
+
+def lottery_round_steps(account=None, vrf_coordinator=None):
+    account = account or get_account()
+    vrf_coordinator = vrf_coordinator or get_contract("vrf_coordinator_v2")
+    is_local = network.show_active() in LOCAL_BLOCKCHAIN_ENVIRONMENTS
+    # On local network we also play for 2 more accounts
+    buyers = [account, accounts[1], accounts[2]] if is_local else [account]
+    lotteries = {}
+
+    def get_lottery(outputs):
+        address = outputs["deploy"]["lottery"]
+        if address not in lotteries:
+            lotteries[address] = LotteryV2.at(address)
+        return lotteries[address]
+
+    def get_round_state(outputs):
+        # State and round id read in one call, so they describe the same block
+        block_number, (lottery_state, current_round) = multicall(
+            [(get_lottery(outputs).getLotteryState, ()), (get_lottery(outputs).getCurrentRoundId, ())]
+        )
+        return int(lottery_state), current_round
+
+    def configured_subscription():
+        if is_local:
+            return None
+        return int(config["networks"][network.show_active()].get("subscriptionId", 0)) or None
+
+    def subscription_done(outputs, saved):
+        subId = saved.get("subId", configured_subscription())
+        if subId is None and get_pending_receipt(saved) is not None:
+            # Crashed run created subscription, but didn't get to save its id
+            subId = wait_for_subscription(vrf_coordinator, chain.get_transaction(saved["pending_tx"]))
+        if subId is None:
+            return None
+        try:
+            vrf_coordinator.getSubscription(subId)
+        except (exceptions.VirtualMachineError, ValueError):
+            # Coordinator reverts for subscriptions which don't exist
+            return None
+        return {"subId": subId}
+
+    def create_subscription(outputs, record):
+        create_sub_tx = send_transaction(vrf_coordinator.createSubscription, (), account, record)
+        subId = wait_for_subscription(vrf_coordinator, create_sub_tx)
+        print(f'SubscriptionId: {subId}')
+        return {"subId": subId, "tx": create_sub_tx.txid}
+
+    def fund_done(outputs, saved):
+        # Balance is checked once per round, fulfillment of our own request must not make us fund it again
+        if "balance" in saved:
+            return {}
+        balance, reqCount, owner, consumers = vrf_coordinator.getSubscription(outputs["subscription"]["subId"])
+        print(f'Your Subscription Balance Is: {balance}')
+        return {"balance": balance} if balance >= MIN_SUBSCRIPTION_BALANCE else None
+
+    def fund_subscription(outputs, record):
+        subId = outputs["subscription"]["subId"]
+        if is_local:
+            fund_sub_tx = send_transaction(vrf_coordinator.fundSubscription, (subId, FUND_AMOUNT), account, record)
+        else:
+            link_token = get_contract("link_token")
+            fund_sub_tx = send_transaction(link_token.transferAndCall, (vrf_coordinator.address, FUND_AMOUNT, convert.to_bytes(subId)), account, record)
+        balance, reqCount, owner, consumers = vrf_coordinator.getSubscription(subId)
+        print(f'Your Subscription Balance Is: {balance}')
+        return {"balance": balance, "tx": fund_sub_tx.txid}
+
+    def deploy_done(outputs, saved):
+        # Lottery saved by pipeline, subscription id can't be read from lottery, so other deployments
+        # (address registry, latest deployment known to brownie) are used only with subscription from "brownie-config.yaml"
+        candidates = [saved.get("lottery")]
+        deploy_receipt = get_pending_receipt(saved)
+        if deploy_receipt is not None:
+            # Crashed run deployed lottery, but didn't get to save its address
+            candidates.append(deploy_receipt.contractAddress)
+        if outputs["subscription"]["subId"] == configured_subscription():
+            candidates.append(get_registered_address("lottery"))
+            if len(LotteryV2) > 0:
+                candidates.append(LotteryV2[-1].address)
+        for address in candidates:
+            if address is not None and len(web3.eth.get_code(address)) > 0:
+                return {"lottery": address}
+        return None
+
+    def deploy(outputs, record):
+        # Deployment is sent without waiting, so its hash is saved the same way as hashes of other transactions
+        deploy_tx = send_transaction(LotteryV2.deploy, lottery_constructor_args(outputs["subscription"]["subId"]), account, record)
+        lottery = LotteryV2.at(deploy_tx.contract_address)
+        print("Lottery Has Been Successfully Deployed!")
+        register_address("lottery", lottery.address)
+        if config["networks"][network.show_active()].get("verify", False):
+            LotteryV2.publish_source(lottery)
+        return {"lottery": lottery.address, "tx": deploy_tx.txid}
+
+    def add_consumer_done(outputs, saved):
+        balance, reqCount, owner, consumers = vrf_coordinator.getSubscription(outputs["subscription"]["subId"])
+        return {} if outputs["deploy"]["lottery"] in consumers else None
+
+    def add_consumer(outputs, record):
+        add_consumer_tx = send_transaction(vrf_coordinator.addConsumer, (outputs["subscription"]["subId"], outputs["deploy"]["lottery"]), account, record)
+        return {"tx": add_consumer_tx.txid}
+
+    def start_done(outputs, saved):
+        lottery_state, current_round = get_round_state(outputs)
+        round_id = saved.get("round_id")
+        if round_id is not None and current_round > round_id:
+            return {"round_id": round_id}
+        # Round has been started by us or someone else, we just play it
+        if lottery_state != LOTTERY_CLOSED:
+            return {"round_id": current_round}
+        return None
+
+    def start(outputs, record):
+        lottery = get_lottery(outputs)
+        round_id = lottery.getCurrentRoundId()
+        start_tx = send_transaction(lottery.startLottery, (), account, record)
+        # New round can have different entry fee
+        entry_fee_cache.invalidate(lottery)
+        print("The Lottery Has Started!")
+        return {"round_id": round_id, "tx": start_tx.txid}
+
+    def missing_buyers(outputs):
+        players = set(iter_players(get_lottery(outputs), round_id=outputs["start"]["round_id"]))
+        return [buyer for buyer in buyers if buyer.address not in players]
+
+    def buy_done(outputs, saved):
+        lottery_state, current_round = get_round_state(outputs)
+        if current_round > outputs["start"]["round_id"] or lottery_state != LOTTERY_OPEN:
+            return {}
+        return {} if not missing_buyers(outputs) else None
+
+    def buy(outputs, record):
+        # Accounts which already bought tickets in this round (e.g. before crash) don't buy again
+        purchases = [(buyer, TICKETS_PER_PLAYER) for buyer in missing_buyers(outputs)]
+        result = buy_tickets_bulk(get_lottery(outputs), purchases, batch_tickets=True, round_id=outputs["start"]["round_id"])
+        if result.failures:
+            raise Exception(f'Failed to buy {len(result.failures)} tickets: {result.failures[0].error}')
+        print("You Have Successfully Bought Lottery Tickets!")
+        return {"txs": [receipt.tx.txid for receipt in result.receipts]}
+
+    def pick_winner_done(outputs, saved):
+        lottery_state, current_round = get_round_state(outputs)
+        round_id = outputs["start"]["round_id"]
+        if current_round == round_id and lottery_state != LOTTERY_CALCULATING:
+            return None
+        # Request id is kept in round record since "pickWinner"
+        requestId = get_lottery(outputs).getRound(round_id)["requestId"]
+        return {"requestId": requestId, "block_number": saved.get("block_number", get_request_block(outputs, saved, round_id))}
+
+    def get_request_block(outputs, saved, round_id):
+        # Block of "pickWinner", fulfillment is searched from it, so it must not be later than the request
+        pick_winner_receipt = get_pending_receipt(saved)
+        if pick_winner_receipt is not None:
+            return pick_winner_receipt.blockNumber
+        # Round picked by someone else (or before crash which lost the hash), request is found from lottery deployment
+        deploy_receipt = get_pending_receipt({"pending_tx": outputs["deploy"]["tx"]}) if "tx" in outputs["deploy"] else None
+        from_block = deploy_receipt.blockNumber if deploy_receipt is not None else 0
+        for event in get_lottery(outputs).events.get_sequence(from_block, web3.eth.block_number, "RequestedLotteryWinner"):
+            if event.args["roundId"] == round_id:
+                return event.blockNumber
+        return from_block
+
+    def pick_winner(outputs, record):
+        lottery = get_lottery(outputs)
+        pick_winner_tx = send_transaction(lottery.pickWinner, (), account, record)
+        requestId = wait_for_request_id(lottery, pick_winner_tx)
+        print(f'RequestId: {requestId}')
+        return {"requestId": requestId, "block_number": pick_winner_tx.block_number, "tx": pick_winner_tx.txid}
+
+    def fulfill_done(outputs, saved):
+        lottery_state, current_round = get_round_state(outputs)
+        round_id = outputs["start"]["round_id"]
+        if current_round <= round_id:
+            return None
+        # Random word isn't stored by lottery, it is read from "WinnerPicked" event of our round
+        winner_picked = wait_for_event(get_lottery(outputs), "WinnerPicked", outputs["pick_winner"]["block_number"], {"roundId": round_id})
+        return {"winner": winner_picked.args["recentWinner"], "randomWord": winner_picked.args["randomWord"]}
+
+    def fulfill(outputs, record):
+        lottery = get_lottery(outputs)
+        requestId = outputs["pick_winner"]["requestId"]
+        if is_local:
+            # Fulfilling The Request (Only For Local!!!)
+            fulfill_tx = send_transaction(vrf_coordinator.fulfillRandomWords, (requestId, lottery.address), account, record)
+            if "WinnerPicked" not in fulfill_tx.events:
+                raise FulfillmentFailedError(f'Fulfillment of request {requestId} failed in transaction {fulfill_tx.txid}')
+            winner_picked = fulfill_tx.events["WinnerPicked"]
+            return {"winner": winner_picked["recentWinner"], "randomWord": winner_picked["randomWord"], "tx": fulfill_tx.txid}
+        # Waiting until VRF node fulfills our request and lottery emits "WinnerPicked"
+        winner_picked = wait_for_winner(vrf_coordinator, lottery, requestId, outputs["pick_winner"]["block_number"])
+        return {"winner": winner_picked.args["recentWinner"], "randomWord": winner_picked.args["randomWord"], "tx": winner_picked.transactionHash.hex()}
+
+    return [
+        Step("subscription", create_subscription, subscription_done),
+        Step("fund", fund_subscription, fund_done, ("subscription",)),
+        Step("deploy", deploy, deploy_done, ("subscription",)),
+        Step("add_consumer", add_consumer, add_consumer_done, ("subscription", "deploy")),
+        # Funding and consumer list don't change identity of anything, so steps below don't depend on them (they just run earlier)
+        Step("start", start, start_done, ("deploy",)),
+        Step("buy", buy, buy_done, ("start",)),
+        Step("pick_winner", pick_winner, pick_winner_done, ("buy",)),
+        Step("fulfill", fulfill, fulfill_done, ("pick_winner",)),
+        # Final reads don't depend on each other
+        Step("snapshot", lambda outputs: get_lottery_snapshot(get_lottery(outputs), vrf_coordinator, outputs["subscription"]["subId"]), requires=("fulfill",), read_only=True),
+        Step("round", lambda outputs: get_lottery(outputs).getRound(outputs["start"]["round_id"]), requires=("fulfill",), read_only=True),
+        Step("players", lambda outputs: list(iter_players(get_lottery(outputs), round_id=outputs["start"]["round_id"])), requires=("fulfill",), read_only=True),
+    ]
+
+
+def run_round_pipeline(checkpoint_path=None, new_round=False, until=None):
+    checkpoint = Checkpoint(checkpoint_path)
+    if new_round:
+        # Subscription and lottery are reused, only round steps are played again
+        checkpoint.discard(ROUND_STEPS)
+    return run_steps(lottery_round_steps(), checkpoint, until)
@@ -0,0 +1,37 @@
+from brownie import web3
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+
+# Streaming lottery participants page by page with "getRoundPlayersRange" instead of loading whole array with "getPlayers"
+
+PAGE_SIZE = 500
+
+
+def iter_players(lottery, page_size=PAGE_SIZE, concurrency=1, block_identifier=None, round_id=None):
+    # All pages are read at the same block, so players added in the meantime don't shift pages
+    # Without "round_id" players of current round are streamed
+    if block_identifier is None:
+        block_identifier = web3.eth.block_number
+    if round_id is None:
+        round_id = lottery.getCurrentRoundId(block_identifier=block_identifier)
+    players_amount = lottery.getRoundPlayersCount(round_id, block_identifier=block_identifier)
+    offsets = range(0, players_amount, page_size)
+
+    def fetch_page(offset):
+        return lottery.getRoundPlayersRange(round_id, offset, page_size, block_identifier=block_identifier)
+
+    if concurrency <= 1:
+        for offset in offsets:
+            yield from fetch_page(offset)
+        return
+
+    # Keeping at most "concurrency" pages in flight and yielding them in order
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = deque()
+        for offset in offsets:
+            pending.append(executor.submit(fetch_page, offset))
+            if len(pending) >= concurrency:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
@@ -0,0 +1,54 @@
+from brownie import web3
+from contextlib import contextmanager
+from web3.middleware import Web3Middleware
+import itertools
+import time
+
+# Observing JSON-RPC requests sent by brownie, used by instrumentation and benchmark:
+# Requests are seen by middleware injected into web3 middleware onion. Replacing "provider.make_request" doesn't work,
+# web3 builds request function from it once and keeps it cached until middleware onion changes.
+
+# Every tracker gets its own middleware name, so trackers can be nested
+_tracker_ids = itertools.count()
+
+
+class RequestListenerMiddleware(Web3Middleware):
+    # Calls "listener(method, params, response, started, finished)" after every request, times come from time.perf_counter()
+    def __init__(self, w3, listener):
+        super().__init__(w3)
+        self.listener = listener
+
+    def wrap_make_request(self, make_request):
+        def middleware(method, params):
+            started = time.perf_counter()
+            response = None
+            try:
+                response = make_request(method, params)
+                return response
+            finally:
+                self.listener(method, params, response, started, time.perf_counter())
+
+        return middleware
+
+
+@contextmanager
+def track_rpc_requests(listener):
+    # Injected as the outermost layer, so requests are seen the same way as brownie sends them
+    name = f'rpc_tracker_{next(_tracker_ids)}'
+    web3.middleware_onion.inject(lambda w3: RequestListenerMiddleware(w3, listener), name=name, layer=0)
+    try:
+        yield
+    finally:
+        web3.middleware_onion.remove(name)
+
+
+@contextmanager
+def count_rpc_calls():
+    # Counting JSON-RPC requests sent by brownie to the node, grouped by method
+    counts = {}
+
+    def count(method, params, response, started, finished):
+        counts[method] = counts.get(method, 0) + 1
+
+    with track_rpc_requests(count):
+        yield counts
@@ -0,0 +1,260 @@
+from scripts.helpful_scripts import get_account, get_contract, LOCAL_BLOCKCHAIN_ENVIRONMENTS, LOTTERY_OPEN, LOTTERY_CALCULATING, LOTTERY_CLOSED
+from scripts.run_lottery import deploy_lottery_local
+from scripts.multicall import multicall
+from scripts.bulk_purchase import ENTRY_FEE_BUFFER
+from scripts.fee_cache import entry_fee_cache, get_entry_fee
+from scripts.vrf_fulfiller import VRFFulfiller
+from scripts.waiters import FULFILLMENT_TIMEOUT, POLL_INTERVAL, FulfillmentFailedError, wait_for_confirmation
+from brownie import network, config, accounts, web3, LotteryV2
+import asyncio
+import time
+
+# Running many LotteryV2 instances which share one VRF subscription:
+# 1. Every instance plays its rounds in its own asyncio task, so one lottery waiting for randomness doesn't block the others
+# 2. "pickWinner" calls are staggered and number of unfulfilled requests is capped by what subscription can pay for
+# 3. Single watcher scans coordinator "RandomWordsFulfilled" events and wakes up the instance whose request got fulfilled,
+#    fulfillments of other consumers of the coordinator are ignored
+# 4. Transactions of one sender are submitted one by one (nonces), their confirmations are awaited concurrently
+# Blocking brownie calls run in worker threads.
+#
+# Usage: brownie run scripts/scheduler.py main 5 3 (5 lotteries, 3 rounds each)
+
+INSTANCES = 3
+ROUNDS = 2
+MAX_PENDING_REQUESTS = 5
+# Seconds between two consecutive "pickWinner" calls
+PICK_WINNER_INTERVAL = 1
+# Upper bound of LINK paid by subscription for one request, used to find how many requests it can afford at once
+REQUEST_COST = 5 * 10 ** 17
+# Subscription pays for fulfillments of all instances
+SCHEDULER_FUND_AMOUNT = 100 * 10 ** 18
+
+
+def main(instances = None, rounds = None):
+    instances = int(instances) if instances else INSTANCES
+    rounds = int(rounds) if rounds else ROUNDS
+    account = get_account()
+    vrfCoordinatorV2Mock = get_contract("vrf_coordinator_v2")
+    if network.show_active() in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
+        # Creating subscription shared by freshly deployed lotteries...
+        subId = vrfCoordinatorV2Mock.createSubscription({"from": account}).return_value
+        vrfCoordinatorV2Mock.fundSubscription(subId, SCHEDULER_FUND_AMOUNT, {"from": account})
+        lotteries = [deploy_lottery_local(subId) for _ in range(instances)]
+        for lottery in lotteries:
+            vrfCoordinatorV2Mock.addConsumer(subId, lottery.address, {"from": account})
+    else:
+        # Lotteries deployed earlier with subscription from "brownie-config.yaml"
+        subId = int(config["networks"][network.show_active()]["subscriptionId"])
+        lotteries = list(LotteryV2)[-instances:]
+        if not lotteries:
+            print("There Are No Lotteries To Run, Deploy Them First")
+            return
+    # Locally requests are fulfilled by background VRF node, same as on testnet
+    scheduler = LotteryScheduler(lotteries, vrfCoordinatorV2Mock, subId, fulfill_locally=False)
+    started = time.perf_counter()
+    if network.show_active() in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
+        with VRFFulfiller(vrfCoordinatorV2Mock):
+            results = asyncio.run(scheduler.run(rounds))
+    else:
+        results = asyncio.run(scheduler.run(rounds))
+    elapsed = time.perf_counter() - started
+    for instance in results:
+        print(f'Lottery {instance.lottery.address} Winners: {instance.winners}')
+    print(f'Played {sum(len(instance.winners) for instance in results)} Rounds In {elapsed:.2f}s')
+
+
+class LotteryInstance:
+    # Scheduler's view of one lottery, "state" is the last LotteryState we have seen
+    def __init__(self, lottery):
+        self.lottery = lottery
+        self.state = None
+        self.round_id = None
+        self.request_id = None
+        self.winners = []
+
+
+class LotteryScheduler:
+    def __init__(
+        self,
+        lotteries,
+        vrf_coordinator,
+        subId,
+        account=None,
+        buyers=None,
+        tickets=1,
+        max_pending_requests=MAX_PENDING_REQUESTS,
+        pick_winner_interval=PICK_WINNER_INTERVAL,
+        request_cost=REQUEST_COST,
+        fulfill_locally=None,
+        poll_interval=POLL_INTERVAL,
+        timeout=FULFILLMENT_TIMEOUT,
+    ):
+        self.instances = [LotteryInstance(lottery) for lottery in lotteries]
+        self.vrf_coordinator = vrf_coordinator
+        self.subId = subId
+        self.account = account or get_account()
+        is_local = network.show_active() in LOCAL_BLOCKCHAIN_ENVIRONMENTS
+        # On local network we also play for 2 more accounts
+        self.buyers = buyers or ([self.account, accounts[1], accounts[2]] if is_local else [self.account])
+        self.tickets = tickets
+        self.max_pending_requests = max_pending_requests
+        self.pick_winner_interval = pick_winner_interval
+        self.request_cost = request_cost
+        # There is no VRF node on local network, so scheduler fulfills requests with coordinator mock itself
+        self.fulfill_locally = is_local if fulfill_locally is None else fulfill_locally
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        # Highest number of unfulfilled requests seen at once
+        self.max_observed_pending = 0
+
+    async def run(self, rounds):
+        # Plays "rounds" rounds on every instance, returns instances with their winners
+        self._sender_locks = {}
+        self._fulfillments = {}
+        self._fulfilled = {}
+        # Request ids sent by our lotteries, only their fulfillments are kept until someone waits for them
+        self._requested = set()
+        self._pending = 0
+        self._capacity = asyncio.Condition()
+        self._pick_lock = asyncio.Lock()
+        self._last_pick = None
+        self._local_fulfillments = []
+        await self.refresh_states()
+        watcher = asyncio.create_task(self._watch_fulfillments(await asyncio.to_thread(lambda: web3.eth.block_number)))
+        try:
+            await asyncio.gather(*[self._play(instance, rounds) for instance in self.instances])
+        finally:
+            watcher.cancel()
+            for task in self._local_fulfillments:
+                task.cancel()
+        return self.instances
+
+    async def refresh_states(self):
+        # States and round ids of all instances read with one Multicall3 call
+        calls = []
+        for instance in self.instances:
+            calls += [(instance.lottery.getLotteryState, ()), (instance.lottery.getCurrentRoundId, ())]
+        block_number, results = await asyncio.to_thread(multicall, calls)
+        for index, instance in enumerate(self.instances):
+            instance.state = int(results[2 * index])
+            instance.round_id = results[2 * index + 1]
+
+    async def _play(self, instance, rounds):
+        lottery = instance.lottery
+        for round_number in range(rounds):
+            if instance.state == LOTTERY_CALCULATING:
+                # Round picked before scheduler started, we just wait for it (its request is pending as well)
+                round_record = await asyncio.to_thread(lottery.getRound, instance.round_id)
+                instance.request_id = round_record["requestId"]
+                self._requested.add(instance.request_id)
+                async with self._capacity:
+                    self._pending += 1
+            else:
+                if instance.state == LOTTERY_CLOSED:
+                    await self._send(self.account, lottery.startLottery)
+                    # New round can have different entry fee
+                    entry_fee_cache.invalidate(lottery)
+                    instance.state = LOTTERY_OPEN
+                await self._buy_tickets(instance)
+                await self._pick_winner(instance)
+            await self._wait_for_winner(instance)
+
+    async def _buy_tickets(self, instance):
+        entry_fee = (await asyncio.to_thread(get_entry_fee, instance.lottery, instance.round_id) + ENTRY_FEE_BUFFER) * self.tickets
+        await asyncio.gather(*[self._send(buyer, instance.lottery.buyTickets, self.tickets, value=entry_fee) for buyer in self.buyers])
+
+    async def _pick_winner(self, instance):
+        # Waiting until subscription can pay for one more request
+        async with self._capacity:
+            while True:
+                capacity = await self._get_capacity()
+                if capacity == 0 and self._pending == 0:
+                    raise Exception(f'Subscription {self.subId} can not pay for any request')
+                if self._pending < capacity:
+                    break
+                await self._capacity.wait()
+            self._pending += 1
+            self.max_observed_pending = max(self.max_observed_pending, self._pending)
+        try:
+            # Spreading requests in time, so they don't all land in the same block
+            async with self._pick_lock:
+                if self._last_pick is not None:
+                    await asyncio.sleep(max(self._last_pick + self.pick_winner_interval - time.monotonic(), 0))
+                self._last_pick = time.monotonic()
+            pick_winner_tx = await self._send(self.account, instance.lottery.pickWinner)
+        except Exception:
+            await self._release_request()
+            raise
+        instance.state = LOTTERY_CALCULATING
+        instance.request_id = pick_winner_tx.events["RequestedLotteryWinner"]["requestId"]
+        self._requested.add(instance.request_id)
+        if self.fulfill_locally:
+            self._local_fulfillments.append(asyncio.create_task(self._fulfill(instance)))
+
+    async def _get_capacity(self):
+        balance, reqCount, owner, consumers = await asyncio.to_thread(self.vrf_coordinator.getSubscription, self.subId)
+        return min(self.max_pending_requests, balance // self.request_cost)
+
+    async def _release_request(self):
+        async with self._capacity:
+            self._pending -= 1
+            self._capacity.notify_all()
+
+    async def _fulfill(self, instance):
+        # Doing job of VRF node (Only For Local!!!)
+        await self._send(self.account, self.vrf_coordinator.fulfillRandomWords, instance.request_id, instance.lottery.address)
+
+    async def _wait_for_winner(self, instance):
+        request_id = instance.request_id
+        if request_id in self._fulfilled:
+            fulfilled = self._fulfilled.pop(request_id)
+        else:
+            self._fulfillments[request_id] = asyncio.get_running_loop().create_future()
+            try:
+                fulfilled = await asyncio.wait_for(self._fulfillments[request_id], self.timeout)
+            finally:
+                self._fulfillments.pop(request_id, None)
+        self._requested.discard(request_id)
+        await self._release_request()
+        if not fulfilled.args["success"]:
+            raise FulfillmentFailedError(f'Fulfillment of request {request_id} failed in transaction {fulfilled.transactionHash.hex()}')
+        round_record = await asyncio.to_thread(instance.lottery.getRound, instance.round_id)
+        instance.winners.append(round_record["winner"])
+        instance.round_id += 1
+        instance.state = LOTTERY_CLOSED
+        print(f'Lottery {instance.lottery.address} Round {instance.round_id - 1} Winner Is: {round_record["winner"]}')
+
+    async def _watch_fulfillments(self, from_block):
+        # One scan of coordinator serves all instances, fulfillments are handed over as soon as they show up
+        lottery_addresses = {instance.lottery.address for instance in self.instances}
+        while True:
+            to_block = await asyncio.to_thread(lambda: web3.eth.block_number)
+            if to_block >= from_block:
+                # Requests are scanned too, fulfillment can show up before "pickWinner" confirmation told us the request id
+                requests = await asyncio.to_thread(self.vrf_coordinator.events.get_sequence, from_block, to_block, "RandomWordsRequested")
+                self._requested.update(event.args["requestId"] for event in requests if event.args["sender"] in lottery_addresses)
+                events = await asyncio.to_thread(self.vrf_coordinator.events.get_sequence, from_block, to_block, "RandomWordsFulfilled")
+                for event in events:
+                    request_id = event.args["requestId"]
+                    future = self._fulfillments.get(request_id)
+                    if future is not None and not future.done():
+                        future.set_result(event)
+                    elif request_id in self._requested:
+                        # Our request whose instance doesn't wait for it yet, kept until it asks
+                        self._fulfilled[request_id] = event
+                from_block = to_block + 1
+            await asyncio.sleep(self.poll_interval)
+
+    async def _send(self, sender, method, *args, value=None):
+        # Sender's transactions are submitted one at a time, so brownie gives them consecutive nonces,
+        # waiting for confirmation happens outside of the lock
+        lock = self._sender_locks.setdefault(sender.address, asyncio.Lock())
+        tx_params = {"from": sender, "required_confs": 0}
+        if value is not None:
+            tx_params["value"] = value
+        async with lock:
+            tx = await asyncio.to_thread(method, *args, tx_params)
+        await asyncio.to_thread(wait_for_confirmation, tx)
+        if tx.status == 0:
+            raise Exception(f'Transaction {tx.txid} reverted: {tx.revert_msg}')
+        return tx
@@ -0,0 +1,167 @@
+from scripts.helpful_scripts import get_contract, LOCAL_BLOCKCHAIN_ENVIRONMENTS
+from brownie import network, accounts, web3
+from eth_utils import keccak
+from typing import NamedTuple
+import threading
+import time
+
+# Background VRF node for local networks, so nobody has to fulfill requests of VRFCoordinatorV2Mock by hand:
+# 1. "RandomWordsRequested" events of coordinator are scanned incrementally, consumer is event "sender"
+# 2. Requests older than "latency" seconds are fulfilled in batches, whole batch is one Multicall3 transaction
+#    (mock lets anyone fulfill, failure of one request doesn't revert the others)
+# 3. With "seed" random words are derived from seed and requestId, so the same run always picks the same winners
+# Transactions are sent from separate account (the last local one), so they don't take nonces of scripts/tests.
+#
+# Usage: brownie run scripts/vrf_fulfiller.py (fulfills requests until stopped with Ctrl+C)
+
+FULFILLMENT_LATENCY = 0
+# 10 callbacks with 500000 gas limit still fit into one block of local chain
+BATCH_SIZE = 10
+FULFILLER_POLL_INTERVAL = 0.5
+# Gas used by coordinator and Multicall3 around every callback, callback itself gets its "callbackGasLimit"
+FULFILLMENT_GAS_OVERHEAD = 150000
+# Requests of batch whose transaction failed are tried again in next polls, then reported in "failures"
+MAX_FULFILL_ATTEMPTS = 3
+
+
+class PendingRequest(NamedTuple):
+    request_id: int
+    consumer: str
+    num_words: int
+    callback_gas_limit: int
+    # time.monotonic() at which request has been noticed
+    seen_at: float
+    # Failed batch transactions this request was part of
+    attempts: int = 0
+
+
+def main(latency = None, seed = None):
+    fulfiller = VRFFulfiller(latency=float(latency) if latency else FULFILLMENT_LATENCY, seed=int(seed) if seed else None)
+    print("Fulfilling VRF Requests, Press Ctrl+C To Stop...")
+    try:
+        while True:
+            for tx in fulfiller.poll_once():
+                print(f'Fulfilled Requests In Transaction: {tx.txid}')
+            time.sleep(fulfiller.poll_interval)
+    except KeyboardInterrupt:
+        print(f'Fulfilled {len(fulfiller.fulfilled)} Requests')
+
+
+class VRFFulfiller:
+    def __init__(
+        self,
+        vrf_coordinator=None,
+        account=None,
+        latency=FULFILLMENT_LATENCY,
+        batch_size=BATCH_SIZE,
+        seed=None,
+        poll_interval=FULFILLER_POLL_INTERVAL,
+        from_block=None,
+    ):
+        if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
+            raise Exception("VRF fulfiller works only with VRFCoordinatorV2Mock on local network")
+        self.vrf_coordinator = vrf_coordinator or get_contract("vrf_coordinator_v2")
+        self.account = account or accounts[-1]
+        self.latency = latency
+        self.batch_size = batch_size
+        self.seed = seed
+        self.poll_interval = poll_interval
+        self.from_block = web3.eth.block_number if from_block is None else from_block
+        self.pending = {}
+        # Request ids fulfilled by us and requests which couldn't be fulfilled (e.g. already fulfilled by someone else or callback reverted)
+        self.fulfilled = []
+        self.failures = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="vrf-fulfiller", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception as error:
+                # Node keeps working, e.g. when reading events failed
+                print(f'VRF Fulfiller Error: {error}')
+            self._stop.wait(self.poll_interval)
+
+    def poll_once(self):
+        # Picks up new requests and fulfills the ones which waited long enough, returns sent transactions
+        to_block = web3.eth.block_number
+        if to_block >= self.from_block:
+            for event in self.vrf_coordinator.events.get_sequence(self.from_block, to_block, "RandomWordsRequested"):
+                request = PendingRequest(
+                    event.args["requestId"], event.args["sender"], event.args["numWords"], event.args["callbackGasLimit"], time.monotonic()
+                )
+                self.pending[request.request_id] = request
+            self.from_block = to_block + 1
+        ready = [request for request in self.pending.values() if time.monotonic() - request.seen_at >= self.latency]
+        txs = []
+        for batch_start in range(0, len(ready), self.batch_size):
+            batch = ready[batch_start:batch_start + self.batch_size]
+            try:
+                txs.append(self._fulfill_batch(batch))
+            except Exception as error:
+                # Other batches are still sent, requests of this one are queued again
+                print(f'VRF Fulfiller Error: {error}')
+                self._retry(batch)
+        return txs
+
+    def _retry(self, requests):
+        for request in requests:
+            if request.attempts + 1 < MAX_FULFILL_ATTEMPTS:
+                self.pending[request.request_id] = request._replace(attempts=request.attempts + 1)
+            else:
+                self.failures.append(request.request_id)
+
+    def random_words(self, request_id, num_words):
+        # Empty list lets coordinator mock use its own words, keccak256(abi.encode(requestId, i))
+        if self.seed is None:
+            return []
+        return [
+            int.from_bytes(keccak(self.seed.to_bytes(32, "big") + request_id.to_bytes(32, "big") + index.to_bytes(32, "big")), "big")
+            for index in range(num_words)
+        ]
+
+    def _fulfill_batch(self, requests):
+        multicall3 = get_contract("multicall3")
+        calls = [
+            (
+                self.vrf_coordinator.address,
+                True,
+                self.vrf_coordinator.fulfillRandomWordsWithOverride.encode_input(
+                    request.request_id, request.consumer, self.random_words(request.request_id, request.num_words)
+                ),
+            )
+            for request in requests
+        ]
+        # Gas is set explicitly, estimation could leave callbacks with less gas than they asked for (they fail without reverting batch)
+        gas_limit = sum(request.callback_gas_limit + FULFILLMENT_GAS_OVERHEAD for request in requests)
+        for request in requests:
+            self.pending.pop(request.request_id, None)
+        tx = multicall3.aggregate3(calls, {"from": self.account, "gas_limit": gas_limit})
+        # Coordinator emits "RandomWordsFulfilled" also when consumer callback reverted (or ran out of gas), then "success" is false
+        fulfillments = tx.events["RandomWordsFulfilled"] if "RandomWordsFulfilled" in tx.events else []
+        fulfilled = {event["requestId"] for event in fulfillments if event["success"]}
+        for request in requests:
+            if request.request_id in fulfilled:
+                self.fulfilled.append(request.request_id)
+            else:
+                self.failures.append(request.request_id)
+        return tx
@@ -0,0 +1,125 @@
+from brownie import web3
+import time
+
+# Waiting for chain progress instead of sleeping for a fixed amount of time.
+# Every waiter polls with exponential backoff and gives up once its deadline passes,
+# so a step ends as soon as the chain reaches the state we are waiting for.
+
+# Default deadlines (in seconds) for each kind of step
+CONFIRMATION_TIMEOUT = 300
+STATE_CHANGE_TIMEOUT = 300
+FULFILLMENT_TIMEOUT = 900
+
+# Polling starts fast and backs off up to MAX_POLL_INTERVAL
+POLL_INTERVAL = 1
+MAX_POLL_INTERVAL = 15
+BACKOFF_FACTOR = 2
+
+
+class WaitTimeoutError(Exception):
+    pass
+
+
+class FulfillmentFailedError(Exception):
+    pass
+
+
+class TransactionRevertedError(Exception):
+    pass
+
+
+def poll_until(check, timeout, description, poll_interval=POLL_INTERVAL, max_poll_interval=MAX_POLL_INTERVAL):
+    # "check" returns None while we should keep waiting and anything else once we are done
+    deadline = time.monotonic() + timeout
+    interval = poll_interval
+    while True:
+        result = check()
+        if result is not None:
+            return result
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise WaitTimeoutError(f'Timed out after {timeout}s waiting for {description}')
+        time.sleep(min(interval, remaining))
+        interval = min(interval * BACKOFF_FACTOR, max_poll_interval)
+
+
+def wait_for_confirmation(tx, confirmations=1, timeout=CONFIRMATION_TIMEOUT):
+    # Brownie keeps updating pending receipts in the background, so we only have to look at them
+    def check():
+        if tx.status == -1:
+            return None
+        if tx.status == 0:
+            # Reverted transactions will never get the state we are waiting for
+            return tx
+        if tx.confirmations < confirmations:
+            return None
+        return tx
+
+    return poll_until(check, timeout, f'{confirmations} confirmation(s) of {tx.txid}')
+
+
+def raise_if_reverted(tx, description):
+    # Reverted transaction never emits events we would wait for, so waiting for them would only end with timeout
+    if tx.status == 0:
+        raise TransactionRevertedError(f'{description} {tx.txid} reverted: {tx.revert_msg}')
+
+
+def wait_for_event(contract, event_name, from_block, filters=None, timeout=CONFIRMATION_TIMEOUT):
+    # Scanning only new blocks on every poll, "filters" are matched against event arguments
+    filters = filters or {}
+    cursor = {"from_block": from_block}
+
+    def check():
+        to_block = web3.eth.block_number
+        if to_block < cursor["from_block"]:
+            return None
+        events = contract.events.get_sequence(cursor["from_block"], to_block, event_name)
+        cursor["from_block"] = to_block + 1
+        for event in events:
+            if all(event.args[key] == value for key, value in filters.items()):
+                return event
+        return None
+
+    return poll_until(check, timeout, f'{event_name} event from {contract.address}')
+
+
+def wait_for_lottery_state(lottery, state, timeout=STATE_CHANGE_TIMEOUT):
+    def check():
+        if int(lottery.getLotteryState()) == int(state):
+            return state
+        return None
+
+    return poll_until(check, timeout, f'lottery {lottery.address} to reach state {state}')
+
+
+def wait_for_subscription(vrf_coordinator, create_sub_tx, timeout=CONFIRMATION_TIMEOUT):
+    # Returns subId as soon as "SubscriptionCreated" is confirmed
+    wait_for_confirmation(create_sub_tx, timeout=timeout)
+    raise_if_reverted(create_sub_tx, "Subscription creation")
+    if "SubscriptionCreated" in create_sub_tx.events:
+        return create_sub_tx.events["SubscriptionCreated"]["subId"]
+    # Receipts of transactions sent to contracts loaded from ABI might not be decoded yet
+    event = wait_for_event(vrf_coordinator, "SubscriptionCreated", create_sub_tx.block_number, timeout=timeout)
+    return event.args["subId"]
+
+
+def wait_for_request_id(lottery, pick_winner_tx, timeout=CONFIRMATION_TIMEOUT):
+    # Returns requestId emitted with "RequestedLotteryWinner"
+    wait_for_confirmation(pick_winner_tx, timeout=timeout)
+    raise_if_reverted(pick_winner_tx, "Winner request")
+    if "RequestedLotteryWinner" in pick_winner_tx.events:
+        return pick_winner_tx.events["RequestedLotteryWinner"]["requestId"]
+    event = wait_for_event(lottery, "RequestedLotteryWinner", pick_winner_tx.block_number, timeout=timeout)
+    return event.args["requestId"]
+
+
+def wait_for_winner(vrf_coordinator, lottery, request_id, from_block, timeout=FULFILLMENT_TIMEOUT):
+    # 1. Wait for coordinator to fulfill our request
+    # 2. If callback failed "WinnerPicked" will never be emitted, so we stop right away
+    # 3. Return "WinnerPicked" event emitted by lottery in fulfillment transaction
+    deadline = time.monotonic() + timeout
+    fulfilled = wait_for_event(vrf_coordinator, "RandomWordsFulfilled", from_block, {"requestId": request_id}, timeout)
+    if not fulfilled.args["success"]:
+        raise FulfillmentFailedError(f'Fulfillment of request {request_id} failed in transaction {fulfilled.transactionHash.hex()}')
+    remaining = max(deadline - time.monotonic(), 0)
+    return wait_for_event(lottery, "WinnerPicked", fulfilled.blockNumber, timeout=remaining)
@@ -0,0 +1,88 @@
+from brownie import network
+from scripts.run_lottery import deploy_lottery_local
+from scripts.fee_cache import entry_fee_cache
+from scripts.vrf_fulfiller import VRFFulfiller
+from scripts.helpful_scripts import LOCAL_BLOCKCHAIN_ENVIRONMENTS, deploy_mocks, get_account, get_contract, invalidate_cache
+import pytest
+
+# Shared local fixtures:
+# 1. Mocks, funded subscription and base lottery are deployed once per module (brownie resets chain between modules)
+# 2. Snapshot is taken after module fixtures and every test is reverted to it, so tests don't see each other's transactions
+# 3. Isolated modules can run in parallel with "brownie test -n auto", every worker gets its own local chain
+
+# Subscription is shared by all tests of module, so it has to pay for many fulfillments
+SUBSCRIPTION_FUND_AMOUNT = 100 * 10 ** 18
+
+
+@pytest.fixture(scope="module")
+def account():
+    return get_account()
+
+
+@pytest.fixture(scope="module")
+def vrf_coordinator(module_isolation):
+    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
+        pytest.skip("Only For Local Testing")
+    # Chain has just been reset, so cached handles point to contracts which no longer exist
+    invalidate_cache()
+    deploy_mocks()
+    return get_contract("vrf_coordinator_v2")
+
+
+@pytest.fixture(scope="module")
+def subscription_id(vrf_coordinator, account):
+    subId = vrf_coordinator.createSubscription({"from": account}).return_value
+    vrf_coordinator.fundSubscription(subId, SUBSCRIPTION_FUND_AMOUNT, {"from": account})
+    return subId
+
+
+@pytest.fixture(scope="module")
+def lottery(vrf_coordinator, subscription_id, account):
+    # Closed lottery added as consumer of funded subscription
+    lottery = deploy_lottery_local(subscription_id)
+    vrf_coordinator.addConsumer(subscription_id, lottery.address, {"from": account})
+    return lottery
+
+
+@pytest.fixture
+def play_round(lottery, vrf_coordinator, account):
+    # Plays one round: start, purchases ((player, tickets) in purchase order), pickWinner and fulfillment by coordinator mock
+    # Returns (requestId, fulfillment transaction), with "fulfill=False" request is left for the test and transaction is None,
+    # "start=False" plays round which test has already started
+    def play(purchases=None, random_words=None, fulfill=True, start=True, round_lottery=None):
+        round_lottery = round_lottery or lottery
+        if start:
+            round_lottery.startLottery({"from": account})
+        for player, tickets in [(account, 1)] if purchases is None else purchases:
+            if tickets == 1:
+                round_lottery.buyTicket({"from": player, "value": round_lottery.getEntryFee()})
+            else:
+                round_lottery.buyTickets(tickets, {"from": player, "value": round_lottery.getEntryFee() * tickets})
+        requestId = round_lottery.pickWinner({"from": account}).events["RequestedLotteryWinner"]["requestId"]
+        if not fulfill:
+            return requestId, None
+        if random_words is None:
+            fulfill_tx = vrf_coordinator.fulfillRandomWords(requestId, round_lottery.address, {"from": account})
+        else:
+            fulfill_tx = vrf_coordinator.fulfillRandomWordsWithOverride(requestId, round_lottery.address, random_words, {"from": account})
+        return requestId, fulfill_tx
+
+    return play
+
+
+@pytest.fixture
+def vrf_fulfiller(vrf_coordinator):
+    # Background VRF node, requests are fulfilled without calling coordinator mock by hand
+    with VRFFulfiller(vrf_coordinator, poll_interval=0.1) as fulfiller:
+        yield fulfiller
+
+
+@pytest.fixture(autouse=True)
+def isolation(request):
+    # Live networks can't be reverted, so tests running there (integration) are not isolated
+    if network.show_active() in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
+        request.getfixturevalue("fn_isolation")
+    yield
+    # Contracts deployed during test are gone after revert, so are fees read from them
+    invalidate_cache()
+    entry_fee_cache.invalidate()
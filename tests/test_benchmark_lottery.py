@@ -0,0 +1,61 @@
+from brownie import network
+from scripts.benchmark_lottery import run_benchmark, analyze_fulfillment, linear_fit, gas_comparison_table
+from scripts.helpful_scripts import LOCAL_BLOCKCHAIN_ENVIRONMENTS
+import pytest
+
+
+def test_linear_fit_and_projection():
+    # Arrange
+    samples = [
+        {"players": 1, "fulfill_gas": 110000, "fulfill_success": True},
+        {"players": 11, "fulfill_gas": 210000, "fulfill_success": True},
+    ]
+    # Act
+    slope, intercept = linear_fit([(1, 10), (3, 30)])
+    fulfillment = analyze_fulfillment(samples, 500000)
+    # Assert
+    assert (slope, intercept) == (10, 0)
+    assert fulfillment["gas_per_player"] == 10000
+    assert fulfillment["exceeded_at_players"] is None
+    assert fulfillment["projected_limit_players"] == 41
+
+
+def test_gas_comparison_table():
+    # Arrange
+    before = {"samples": [{"start_gas": 50000, "buy_ticket_gas_avg": 90000, "pick_winner_gas": 100000, "fulfill_gas": 200000}]}
+    after = {"samples": [
+        {"start_gas": 50000, "buy_ticket_gas_avg": 80000, "pick_winner_gas": 95000, "fulfill_gas": 140000},
+        {"start_gas": 50000, "buy_ticket_gas_avg": 80000, "pick_winner_gas": 95000, "fulfill_gas": 160000},
+    ]}
+    # Act
+    table = gas_comparison_table(before, after)
+    # Assert
+    assert table.splitlines()[0] == "| Phase | Before | After | Change |"
+    assert "| start_gas | 50000 | 50000 | +0.00% |" in table
+    assert "| fulfill_gas | 200000 | 150000 | -25.00% |" in table
+
+
+def test_benchmark_records_every_round():
+    # Arrange
+    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
+        pytest.skip("Only For Local Testing")
+    # Act
+    report = run_benchmark([1, 3], 2)
+    # Assert
+    assert len(report["samples"]) == 4
+    for sample in report["samples"]:
+        assert sample["fulfill_success"]
+        assert sample["buy_ticket_gas_avg"] > 0
+        assert sample["phases"]["buy"]["rpc_calls"] > 0
+    assert report["fulfillment"]["exceeded_at_players"] is None
+
+
+def test_fulfillment_gas_stays_flat():
+    # Arrange
+    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
+        pytest.skip("Only For Local Testing")
+    # Act
+    report = run_benchmark([1, 40], 1)
+    # Assert
+    # Binary search over entries adds few reads, but nothing proportional to number of players
+    assert report["fulfillment"]["growth"] < 0.2
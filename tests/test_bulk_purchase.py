@@ -0,0 +1,30 @@
+from brownie import accounts
+from scripts.bulk_purchase import buy_tickets_bulk
+
+
+def test_bulk_purchase_from_many_accounts(lottery, account):
+    # Arrange
+    lottery.startLottery({"from": account})
+    purchases = [(accounts[i], 2) for i in range(4)]
+    # Act
+    result = buy_tickets_bulk(lottery, purchases, max_in_flight=3)
+    # Assert
+    players, players_amount = lottery.getPlayers()
+    assert len(result.receipts) == 8
+    assert result.failures == []
+    assert players_amount == 8
+    assert sorted(set(players)) == sorted(player.address for player in accounts[:4])
+
+
+def test_bulk_purchase_reports_failures_without_stalling(lottery, account):
+    # Arrange
+    lottery.startLottery({"from": account})
+    # Act
+    # Sending 1 wei is not enough, every ticket should fail with "Lottery__SendMoreToEnterLottery"
+    failed = buy_tickets_bulk(lottery, [(accounts[1], 2), (accounts[2], 1)], entry_fee=1)
+    bought = buy_tickets_bulk(lottery, [(accounts[1], 1), (accounts[2], 1)])
+    # Assert
+    assert failed.receipts == []
+    assert len(failed.failures) == 3
+    assert len(bought.receipts) == 2
+    assert lottery.getPlayers()[1] == 2
@@ -0,0 +1,70 @@
+from brownie import accounts
+from scripts.fairness import (
+    random_words,
+    limbs_to_words,
+    uint256_mod,
+    split_prize_pool,
+    simulate_fixed_round,
+    simulate_random_rounds,
+    verify_history,
+)
+from scripts.indexer import connect, index_lottery
+import numpy as np
+
+
+def test_vectorized_modulo_matches_uint256_math():
+    # Arrange
+    rng = np.random.default_rng(7)
+    limbs = random_words(rng, 1000)
+    moduli = rng.integers(1, 2 ** 32 - 1, size=1000)
+    # Act
+    remainders = uint256_mod(limbs, moduli)
+    # Assert
+    for remainder, word, modulus in zip(remainders, limbs_to_words(limbs), moduli):
+        assert int(remainder) == word % int(modulus)
+
+
+def test_prize_pool_split_rounds_down_like_contract():
+    # Arrange
+    prize_pools = [0, 19, 21, 25 * 10 ** 15, 10 ** 30 + 7]
+    # Act
+    splits = [split_prize_pool(prize_pool) for prize_pool in prize_pools]
+    # Assert
+    for prize_pool, (prize, commission, dust) in zip(prize_pools, splits):
+        assert prize == prize_pool * 19 // 20
+        assert commission == prize_pool * 1 // 20
+        assert prize + commission + dust == prize_pool
+
+
+def test_wins_follow_ticket_shares():
+    # Arrange
+    tickets = [1, 1, 2, 5, 10]
+    # Act
+    fixed_report = simulate_fixed_round(tickets, 200000, seed=1)
+    random_report = simulate_random_rounds(200000, max_players=6, max_tickets=10, seed=1)
+    # Assert
+    assert fixed_report.wins.sum() == 200000
+    assert fixed_report.max_relative_deviation < 0.05
+    assert fixed_report.p_value > 0.001
+    assert random_report.wins.sum() == 200000
+    assert random_report.max_relative_deviation < 0.05
+    assert random_report.p_value > 0.001
+
+
+def test_indexed_history_winners_are_verified(lottery, vrf_coordinator, play_round, tmp_path):
+    # Arrange
+    db_path = str(tmp_path / "lottery_index.db")
+    start_block = lottery.tx.block_number
+    for round_tickets in [[1, 3], [2, 1, 4]]:
+        play_round([(accounts[index + 1], tickets) for index, tickets in enumerate(round_tickets)])
+    index_lottery(lottery, vrf_coordinator, db_path, start_block=start_block, confirmations=0)
+    connection = connect(db_path)
+    # Act
+    result = verify_history(connection, lottery.address)
+    # Recorded winner of second round is replaced with someone who couldn't have won it
+    connection.execute("UPDATE winners SET winner = ? WHERE lottery = ? AND round_id = 1", (accounts[9].address, lottery.address))
+    tampered = verify_history(connection, lottery.address)
+    # Assert
+    assert result.checked == 2
+    assert result.mismatches == []
+    assert tampered.mismatches[0][:2] == (1, accounts[9].address)
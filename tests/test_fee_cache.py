@@ -0,0 +1,82 @@
+from brownie import chain
+from scripts.fee_cache import EntryFeeCache
+from scripts.helpful_scripts import INITIAL_PRICE, get_contract
+
+
+def test_price_snapshot_is_used_until_stale(lottery, account):
+    # Arrange
+    price_feed = get_contract("eth_usd_price_feed")
+    lottery.setPriceRefreshInterval(3600, {"from": account})
+    lottery.startLottery({"from": account})
+    fee_at_start = lottery.getEntryFee()
+    # Act
+    # ETH price doubles, but lottery still uses its snapshot
+    price_feed.updateAnswer(INITIAL_PRICE * 2, {"from": account})
+    fee_with_snapshot = lottery.getEntryFee()
+    lottery.buyTicket({"from": account, "value": fee_with_snapshot})
+    chain.sleep(3601)
+    chain.mine()
+    fee_after_interval = lottery.getEntryFee()
+    lottery.buyTicket({"from": account, "value": fee_after_interval})
+    price, updated_at, refresh_interval = lottery.getPriceSnapshot()
+    # Assert
+    assert fee_with_snapshot == fee_at_start
+    assert fee_after_interval == fee_at_start // 2
+    assert price == INITIAL_PRICE * 2 * 10 ** 10
+    assert refresh_interval == 3600
+
+
+def test_entry_fee_cache(lottery, account):
+    # Arrange
+    price_feed = get_contract("eth_usd_price_feed")
+    lottery.startLottery({"from": account})
+    cache = EntryFeeCache(max_age=3600)
+    # Act
+    cached_fee = cache.get(lottery)
+    fee_before_price_change = cache.get(lottery)
+    # Without price snapshots new price feed answer changes fee right away, so cached fee is read again
+    price_feed.updateAnswer(INITIAL_PRICE * 2, {"from": account})
+    fee_after_price_change = cache.get(lottery)
+    cache.invalidate(lottery)
+    fee_after_invalidation = cache.get(lottery)
+    # Assert
+    assert cached_fee == fee_before_price_change
+    assert fee_after_price_change == lottery.getEntryFee() == cached_fee // 2
+    assert fee_after_invalidation == fee_after_price_change
+
+
+def test_enabling_snapshots_in_open_round_takes_fresh_price(lottery, account):
+    # Arrange
+    price_feed = get_contract("eth_usd_price_feed")
+    lottery.setPriceRefreshInterval(3600, {"from": account})
+    lottery.startLottery({"from": account})
+    fee_at_start = lottery.getEntryFee()
+    lottery.setPriceRefreshInterval(0, {"from": account})
+    price_feed.updateAnswer(INITIAL_PRICE * 2, {"from": account})
+    # Act
+    lottery.setPriceRefreshInterval(3600, {"from": account})
+    price, updated_at, refresh_interval = lottery.getPriceSnapshot()
+    # Assert
+    assert price == INITIAL_PRICE * 2 * 10 ** 10
+    assert lottery.getEntryFee() == fee_at_start // 2
+
+
+def test_entry_fee_cache_checks_round_and_max_age(lottery, account, play_round):
+    # Arrange
+    price_feed = get_contract("eth_usd_price_feed")
+    lottery.setPriceRefreshInterval(3600, {"from": account})
+    lottery.startLottery({"from": account})
+    cache = EntryFeeCache(max_age=3600)
+    capped_cache = EntryFeeCache(max_age=0)
+    first_round_fee = cache.get(lottery)
+    capped_cache.get(lottery)
+    play_round(start=False)
+    # Act
+    # Another process starts next round, its snapshot has doubled ETH price
+    price_feed.updateAnswer(INITIAL_PRICE * 2, {"from": account})
+    lottery.startLottery({"from": account})
+    # Assert
+    # Snapshot of first round is still fresh, only round id tells us that fee is outdated
+    assert cache.get(lottery) == first_round_fee
+    assert cache.get(lottery, round_id=1) == first_round_fee // 2
+    assert capped_cache.get(lottery) == first_round_fee // 2
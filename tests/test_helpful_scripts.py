@@ -0,0 +1,55 @@
+from brownie import network, VRFCoordinatorV2Mock
+from scripts.helpful_scripts import (
+    LOCAL_BLOCKCHAIN_ENVIRONMENTS,
+    BASE_FEE,
+    GAS_PRICE_LINK,
+    get_account,
+    get_contract,
+    invalidate_cache,
+    register_address,
+    get_registered_address,
+)
+import pytest
+
+
+def test_get_contract_is_cached_until_redeploy():
+    # Arrange
+    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
+        pytest.skip("Only For Local Testing")
+    first = get_contract("vrf_coordinator_v2")
+    # Act
+    second = get_contract("vrf_coordinator_v2")
+    redeployed = VRFCoordinatorV2Mock.deploy(BASE_FEE, GAS_PRICE_LINK, {"from": get_account()})
+    third = get_contract("vrf_coordinator_v2")
+    # Assert
+    assert first is second
+    assert third.address == redeployed.address
+
+
+def test_invalidate_cache_resolves_contract_again():
+    # Arrange
+    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
+        pytest.skip("Only For Local Testing")
+    first = get_contract("eth_usd_price_feed")
+    # Act
+    invalidate_cache("eth_usd_price_feed")
+    second = get_contract("eth_usd_price_feed")
+    # Assert
+    assert first is not second
+    assert first.address == second.address
+
+
+def test_address_registry(tmp_path, monkeypatch):
+    # Arrange
+    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
+        pytest.skip("Only For Local Testing")
+    monkeypatch.setenv("ADDRESS_REGISTRY", str(tmp_path / "address_registry.json"))
+    coordinator = get_contract("vrf_coordinator_v2")
+    # Act
+    register_address("vrf_coordinator_v2", coordinator.address)
+    # Externally owned account has no code, so it can't be resolved as contract
+    register_address("lottery", get_account().address)
+    # Assert
+    assert get_registered_address("vrf_coordinator_v2") == coordinator.address
+    assert get_registered_address("lottery") is None
+    assert get_registered_address("link_token") is None
@@ -0,0 +1,26 @@
+from brownie import accounts, web3
+from scripts.indexer import connect, index_lottery, get_player_history, get_round_players, get_round_winner, get_request
+
+
+def test_indexer_keeps_lottery_history(lottery, vrf_coordinator, play_round, tmp_path):
+    # Arrange
+    db_path = str(tmp_path / "lottery_index.db")
+    start_block = lottery.tx.block_number
+    request_ids = []
+    # Act
+    for round_players in [[accounts[1]], [accounts[1], accounts[2]]]:
+        requestId, fulfill_tx = play_round([(player, 2) for player in round_players])
+        request_ids.append(requestId)
+        # First run indexes only first round, second run continues from saved cursor
+        index_lottery(lottery, vrf_coordinator, db_path, start_block=start_block, chunk_size=3, confirmations=2)
+    # Running again only rewinds confirmation window, nothing should be duplicated
+    indexed_to = index_lottery(lottery, vrf_coordinator, db_path, start_block=start_block, confirmations=2)
+    connection = connect(db_path)
+    # Assert
+    assert indexed_to == web3.eth.block_number
+    assert get_round_players(connection, lottery.address, 1) == [(accounts[1].address, 2), (accounts[2].address, 2)]
+    assert len(get_player_history(connection, accounts[1].address)) == 2
+    assert get_round_winner(connection, lottery.address, 0)[0] == accounts[1].address
+    assert get_round_winner(connection, lottery.address, 1)[1] == str(fulfill_tx.events["WinnerPicked"]["randomWord"])
+    assert get_request(connection, request_ids[1])[0][3] == 1
+    assert connection.execute("SELECT COUNT(*) FROM fulfillments").fetchone()[0] == 2
@@ -0,0 +1,41 @@
+from brownie import accounts
+from scripts.instrumentation import Instrumentation, check_gas_baselines, load_gas_baselines, GAS_BASELINES_PATH, GAS_BASELINE_ROUNDS
+import json
+import os
+
+
+def test_instrumentation_records_and_exports(lottery, account, play_round, tmp_path):
+    # Act
+    with Instrumentation() as instrumentation:
+        play_round([(accounts[1], 1), (account, 3)])
+        lottery.getPlayers()
+        # Pending transaction is followed until it is mined
+        lottery.startLottery({"from": account, "required_confs": 0})
+    instrumentation.write_json(str(tmp_path / "instrumentation.json"))
+    prometheus = instrumentation.to_prometheus()
+    summary = instrumentation.summary()
+    # Assert
+    assert summary["LotteryV2.buyTicket"]["count"] == 1
+    assert summary["LotteryV2.buyTicket"]["gas_used"]["max"] > 21000
+    assert summary["LotteryV2.startLottery"]["confirmation_seconds"]["count"] == 2
+    assert summary["LotteryV2.getPlayers"]["kind"] == "call"
+    assert summary["LotteryV2.getPlayers"]["gas_used"]["count"] == 0
+    assert summary["LotteryV2.getPlayers"]["rpc_seconds"]["max"] > 0
+    assert 'lottery_contract_calls_total{function="LotteryV2.buyTicket",kind="transaction"} 1' in prometheus
+    assert 'lottery_contract_gas_used_count{function="VRFCoordinatorV2Mock.fulfillRandomWords"} 1' in prometheus
+    with open(tmp_path / "instrumentation.json") as report_file:
+        assert len(json.load(report_file)["records"]) == len(instrumentation.records)
+
+
+def test_gas_stays_within_baselines(play_round):
+    # Arrange
+    # Baselines are recorded by "brownie run scripts/instrumentation.py update_gas_baselines", never by this test
+    assert os.path.exists(GAS_BASELINES_PATH), f'Missing gas baselines {GAS_BASELINES_PATH}, record them with "brownie run scripts/instrumentation.py update_gas_baselines"'
+    baselines = load_gas_baselines()
+    # Act
+    with Instrumentation() as instrumentation:
+        # Same rounds as used for recording, few of them so we also measure rounds after the first one
+        for purchases in GAS_BASELINE_ROUNDS:
+            play_round([(accounts[index], tickets) for index, tickets in purchases])
+    # Assert
+    assert check_gas_baselines(instrumentation, baselines) == []
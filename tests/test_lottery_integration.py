@@ -2,8 +2,8 @@
 from brownie import network, convert, config, LotteryV2
 from scripts.run_lottery import deploy_lottery
 from scripts.helpful_scripts import LOCAL_BLOCKCHAIN_ENVIRONMENTS, FUND_AMOUNT, get_account, get_contract
+from scripts.waiters import wait_for_subscription, wait_for_request_id, wait_for_winner
 import pytest
-import time
 
 
 def test_can_pick_winner():
@@ -19,8 +19,7 @@ def test_can_pick_winner():
     if subId == 0:
         print("Creating Subscritpion...")
         create_sub_tx = vrfCoordinatorV2Mock.createSubscription({"from": account})
-        time.sleep(60)
-        subId = create_sub_tx.events["SubscriptionCreated"]["subId"]
+        subId = wait_for_subscription(vrfCoordinatorV2Mock, create_sub_tx)
         print("Subscription Created!")
         print(f'SubscriptionId: {subId}')
     
@@ -57,10 +56,11 @@ def test_can_pick_winner():
     lottery.buyTicket({"from": account, "value": lottery.getEntryFee()})
     
 
-    lottery.pickWinner({"from": account})
-    time.sleep(180)
+    pick_winner_tx = lottery.pickWinner({"from": account})
+    requestId = wait_for_request_id(lottery, pick_winner_tx)
+    wait_for_winner(vrfCoordinatorV2Mock, lottery, requestId, pick_winner_tx.block_number)
     
     # Assert
-    assert lottery.winner() == account
+    assert lottery.getWinner() == account
     # <= 1 because we cannot withdraw everything, there will be always something left...
     assert lottery.balance() <= 1
@@ -0,0 +1,22 @@
+from brownie import web3
+from scripts.lottery_status import RPCClient, get_status
+
+
+def test_status_matches_contract(lottery, vrf_coordinator, subscription_id, account):
+    # Arrange
+    lottery.startLottery({"from": account})
+    lottery.buyTickets(2, {"from": account, "value": lottery.getEntryFee() * 2})
+    client = RPCClient(web3.provider.endpoint_uri)
+    # Act
+    status = get_status(client, lottery.address, vrf_coordinator.address, subscription_id)
+    # Same keep-alive connection is used for the next query
+    block_number = client.request("eth_blockNumber", [])
+    client.close()
+    # Assert
+    assert status["block_number"] == int(block_number, 16) == web3.eth.block_number
+    assert status["lottery_state"] == "OPEN"
+    assert status["players_count"] == 1
+    assert status["tickets_count"] == 2
+    assert status["entry_fee"] == lottery.getEntryFee()
+    assert status["balance"] == lottery.balance()
+    assert status["subscription_balance"] == vrf_coordinator.getSubscription(subscription_id)[0]
@@ -1,19 +1,11 @@
 
-from brownie import network, exceptions
-from scripts.run_lottery import deploy_lottery_local
-from scripts.helpful_scripts import LOCAL_BLOCKCHAIN_ENVIRONMENTS, FUND_AMOUNT, get_account, get_contract
+from brownie import exceptions, accounts
+from scripts.run_lottery import get_pending_claims, claim_winnings
 from web3 import Web3
 import pytest
 
 
-def test_get_entrance_fee_and_states():
-    # Arrange
-    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
-        pytest.skip("Only For Local Testing")
-    account = get_account()
-    # We can use 0 for now as we are not funding subscription or adding consumer yet
-    subId = "0"
-    lottery = deploy_lottery_local(subId)
+def test_get_entrance_fee_and_states(lottery, account):
     # Act
     lottery_closed = lottery.getLotteryState()
     lottery.startLottery({"from": account})
@@ -31,52 +23,30 @@ def test_get_entrance_fee_and_states():
     assert expected_entrance_fee == entrance_fee
 
 
-def test_cant_enter_unless_started():
-    # Arrange
-    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
-        pytest.skip("Only For Local Testing")
+def test_cant_enter_unless_started(lottery, account):
     # Act / Assert
-    subId = "0"
-    lottery = deploy_lottery_local(subId)
     # Below says that if it will throw error that means we could't enter lottery, which is good as we need lottery to be started first
     with pytest.raises(exceptions.VirtualMachineError):
-        lottery.buyTicket({"from": get_account(), "value": lottery.getEntryFee()})
+        lottery.buyTicket({"from": account, "value": lottery.getEntryFee()})
 
 
-def test_can_buy_ticket():
+def test_can_buy_ticket(lottery, account):
     # Arrange
-    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
-        pytest.skip("Only For Local Testing")
-    subId = "0"
-    lottery = deploy_lottery_local(subId)
-    lottery.startLottery({"from": get_account()})
+    lottery.startLottery({"from": account})
     # Act
-    lottery.buyTicket({"from": get_account(), "value": lottery.getEntryFee()})
+    lottery.buyTicket({"from": account, "value": lottery.getEntryFee()})
     # Assert
     players, players_amount = lottery.getPlayers()
     # We are checking if we have successfully added player to this lottery, so we check if 1st player account is our account for development network
-    assert players[0] == get_account()
+    assert players[0] == account
 
 
-def test_lottery_picking_winner_and_getters():
-    # Arrange
-    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
-        pytest.skip("Only For Local Testing")
-    account = get_account()
-    vrfCoordinatorV2Mock = get_contract("vrf_coordinator_v2")
-    create_sub_tx = vrfCoordinatorV2Mock.createSubscription()
-    subId = create_sub_tx.return_value
-    vrfCoordinatorV2Mock.fundSubscription(subId, FUND_AMOUNT, {"from": account})
-    lottery = deploy_lottery_local(subId)
-    vrfCoordinatorV2Mock.addConsumer(subId, lottery.address, {"from": account})
+def test_lottery_picking_winner_and_getters(lottery, vrf_coordinator, account, play_round):
     # Act
-    lottery.startLottery({"from": get_account()})
-    lottery.buyTicket({"from": get_account(), "value": lottery.getEntryFee()})
+    requestId, _ = play_round(fulfill=False)
     balance_before_picking = lottery.getLotteryBalance()
     players, players_amount = lottery.getPlayers()
-    pick_winner_tx = lottery.pickWinner({"from": account})
-    requestId = pick_winner_tx.events["RequestedLotteryWinner"]["requestId"]
-    fulfill_tx = vrfCoordinatorV2Mock.fulfillRandomWords(requestId, lottery.address, {"from": account})
+    fulfill_tx = vrf_coordinator.fulfillRandomWords(requestId, lottery.address, {"from": account})
     prize, commission, success, sent = lottery.getLotteryTransactions()
     balance_after_picking = lottery.getLotteryBalance()
     players_after_picking, players_amount_after_picking = lottery.getPlayers()
@@ -84,10 +54,110 @@ def test_lottery_picking_winner_and_getters():
     assert balance_before_picking > 1000
     assert players_amount > 0
     assert lottery.getWinner() == account
-    assert lottery.s_randomWords(0) != 0
+    assert fulfill_tx.events["WinnerPicked"]["randomWord"] != 0
+    assert fulfill_tx.events["WinnerPicked"]["commission"] == commission
     assert commission > 0 
     assert prize > commission 
     assert success == True
     assert sent == True
     assert balance_after_picking < 1
     assert players_amount_after_picking == 0
+
+
+def test_can_buy_multiple_tickets(lottery, account):
+    # Arrange
+    lottery.startLottery({"from": account})
+    entry_fee = lottery.getEntryFee()
+    # Act
+    lottery.buyTickets(5, {"from": account, "value": entry_fee * 5})
+    lottery.buyTicket({"from": accounts[1], "value": entry_fee})
+    # Assert
+    players, players_amount = lottery.getPlayers()
+    assert players == [account, accounts[1]]
+    assert lottery.getPlayersCount() == 2
+    assert lottery.getTicketsCount() == 6
+    # Paying for 4 tickets while buying 5 has to fail
+    with pytest.raises(exceptions.VirtualMachineError):
+        lottery.buyTickets(5, {"from": account, "value": entry_fee * 4})
+    with pytest.raises(exceptions.VirtualMachineError):
+        lottery.buyTickets(0, {"from": account, "value": entry_fee})
+
+
+@pytest.mark.parametrize("random_word, expected_winner_index", [(0, 0), (1, 1), (4, 1), (5, 2), (6, 0), (11, 2)])
+def test_winner_is_picked_by_ticket_ranges(lottery, play_round, random_word, expected_winner_index):
+    # Act
+    # Tickets: 0 -> accounts[0], 1..4 -> accounts[1], 5 -> accounts[2]
+    play_round([(accounts[0], 1), (accounts[1], 4), (accounts[2], 1)], random_words=[random_word])
+    # Assert
+    assert lottery.getWinner() == accounts[expected_winner_index]
+
+
+def test_rounds_history_is_kept(lottery, play_round):
+    # Act
+    for round_players in [[accounts[1]], [accounts[2], accounts[3]]]:
+        requestId, fulfill_tx = play_round([(player, 1) for player in round_players])
+    # Assert
+    first_round = lottery.getRound(0)
+    second_round = lottery.getRound(1)
+    assert lottery.getCurrentRoundId() == 2
+    assert lottery.getPlayersCount() == 0
+    assert first_round[0] == accounts[1]
+    assert second_round[0] in [accounts[2], accounts[3]]
+    assert second_round["requestId"] == requestId
+    assert lottery.getRoundPlayersRange(1, 0, 10) == [accounts[2], accounts[3]]
+    assert lottery.getWinner() == second_round[0]
+    assert fulfill_tx.events["WinnerPicked"]["roundId"] == 1
+    assert fulfill_tx.events["WinnerPicked"]["prize"] == second_round["prize"]
+
+
+def test_pull_payments_mode(lottery, vrf_coordinator, account, play_round):
+    # Arrange
+    lottery.setPullPayments(True, {"from": account})
+    # Act
+    requestId, _ = play_round([(accounts[1], 1)], fulfill=False)
+    winner_balance_before = accounts[1].balance()
+    vrf_coordinator.fulfillRandomWords(requestId, lottery.address, {"from": account})
+    prize, commission, success, sent = lottery.getLotteryTransactions()
+    owed_to_winner = lottery.getPendingWithdrawal(accounts[1])
+    # Assert
+    # Nothing has been sent in callback, everything waits for withdraw
+    assert accounts[1].balance() == winner_balance_before
+    assert success == False and sent == False
+    assert owed_to_winner == prize
+    assert lottery.getPendingWithdrawal(account) == commission
+    with pytest.raises(exceptions.VirtualMachineError):
+        lottery.setPullPayments(False, {"from": accounts[1]})
+    withdraw_tx = lottery.withdraw({"from": accounts[1]})
+    assert withdraw_tx.events["Withdrawal"]["amount"] == prize
+    assert lottery.getPendingWithdrawal(accounts[1]) == 0
+    with pytest.raises(exceptions.VirtualMachineError):
+        lottery.withdraw({"from": accounts[1]})
+
+
+def test_commission_goes_to_deployer_after_ownership_is_renounced(lottery, vrf_coordinator, account, play_round):
+    # Arrange
+    requestId, _ = play_round([(accounts[1], 1)], fulfill=False)
+    lottery.renounceOwnership({"from": account})
+    deployer_balance_before = account.balance()
+    # Act
+    fulfill_tx = vrf_coordinator.fulfillRandomWords(requestId, lottery.address, {"from": accounts[2]})
+    # Assert
+    # Commission of round which was already waiting for winner isn't sent to zero address
+    commission = fulfill_tx.events["WinnerPicked"]["commission"]
+    assert commission > 0
+    assert account.balance() == deployer_balance_before + commission
+
+
+def test_claim_winnings_across_rounds(lottery, account, play_round):
+    # Arrange
+    lottery.setPullPayments(True, {"from": account})
+    for player in [accounts[1], accounts[2], accounts[1]]:
+        play_round([(player, 1)])
+    pending_claims = get_pending_claims(lottery)
+    # Act
+    withdraw_txs = claim_winnings(lottery)
+    # Assert
+    assert set(pending_claims) == {account.address, accounts[1].address, accounts[2].address}
+    assert len(withdraw_txs) == 3
+    assert get_pending_claims(lottery) == {}
+    assert lottery.balance() == 0
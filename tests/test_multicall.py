@@ -0,0 +1,20 @@
+from scripts.multicall import get_lottery_snapshot
+from scripts.helpful_scripts import LOTTERY_OPEN
+
+
+def test_lottery_snapshot_matches_single_calls(lottery, vrf_coordinator, subscription_id, account):
+    # Arrange
+    lottery.startLottery({"from": account})
+    lottery.buyTicket({"from": account, "value": lottery.getEntryFee()})
+    # Act
+    snapshot = get_lottery_snapshot(lottery, vrf_coordinator, subscription_id, include_players=True)
+    # Assert
+    assert snapshot.lottery_state == LOTTERY_OPEN
+    assert snapshot.players == [account]
+    assert snapshot.players_amount == 1
+    assert snapshot.entry_fee == lottery.getEntryFee()
+    assert snapshot.lottery_balance == lottery.getLotteryBalance({"from": account})
+    # No winner has been picked yet, so there is no prize
+    assert snapshot.prize == 0
+    assert snapshot.subscription_balance == vrf_coordinator.getSubscription(subscription_id)[0]
+    assert lottery.address in snapshot.consumers
@@ -0,0 +1,35 @@
+from brownie import accounts, history
+from scripts.pipeline import Checkpoint, run_round_pipeline
+
+
+def test_pipeline_resumes_without_repeating_transactions(vrf_coordinator, account, tmp_path):
+    # Arrange
+    checkpoint_path = str(tmp_path / "lottery_pipeline.json")
+    # First run "crashes" right after picking winner
+    picked = run_round_pipeline(checkpoint_path, until="pick_winner")
+    transactions_before_resume = len(history)
+    # Act
+    resumed = run_round_pipeline(checkpoint_path)
+    transactions_after_resume = len(history)
+    repeated = run_round_pipeline(checkpoint_path)
+    # Assert
+    # Resumed run only fulfills the request, finished round is only read again
+    assert transactions_after_resume == transactions_before_resume + 1
+    assert len(history) == transactions_after_resume
+    assert resumed["pick_winner"]["requestId"] == picked["pick_winner"]["requestId"]
+    assert repeated["fulfill"]["winner"] == resumed["fulfill"]["winner"] == resumed["round"][0]
+    assert sorted(resumed["players"]) == sorted(player.address for player in [account, accounts[1], accounts[2]])
+    assert Checkpoint(checkpoint_path).get("fulfill")["winner"] == resumed["fulfill"]["winner"]
+
+
+def test_pipeline_plays_new_round_with_same_lottery(vrf_coordinator, tmp_path):
+    # Arrange
+    checkpoint_path = str(tmp_path / "lottery_pipeline.json")
+    first = run_round_pipeline(checkpoint_path)
+    # Act
+    second = run_round_pipeline(checkpoint_path, new_round=True)
+    # Assert
+    assert second["deploy"]["lottery"] == first["deploy"]["lottery"]
+    assert second["subscription"]["subId"] == first["subscription"]["subId"]
+    assert second["start"]["round_id"] == first["start"]["round_id"] + 1
+    assert second["pick_winner"]["requestId"] != first["pick_winner"]["requestId"]
@@ -0,0 +1,32 @@
+from brownie import accounts
+from scripts.players import iter_players
+import pytest
+
+
+@pytest.fixture
+def lottery_with_players(lottery, account):
+    lottery.startLottery({"from": account})
+    for i in range(7):
+        lottery.buyTicket({"from": accounts[i % 3], "value": lottery.getEntryFee()})
+    return lottery
+
+
+def test_players_range(lottery_with_players):
+    # Act
+    players, players_amount = lottery_with_players.getPlayers()
+    # Assert
+    assert lottery_with_players.getPlayersCount() == players_amount == 7
+    assert lottery_with_players.getPlayersRange(0, 3) == players[0:3]
+    assert lottery_with_players.getPlayersRange(5, 10) == players[5:7]
+    assert lottery_with_players.getPlayersRange(7, 10) == []
+    # Huge limit must not overflow
+    assert lottery_with_players.getPlayersRange(1, 2 ** 256 - 1) == players[1:]
+
+
+@pytest.mark.parametrize("concurrency", [1, 3])
+def test_iter_players_streams_all_pages(lottery_with_players, concurrency):
+    # Act
+    streamed = list(iter_players(lottery_with_players, page_size=2, concurrency=concurrency))
+    # Assert
+    players, players_amount = lottery_with_players.getPlayers()
+    assert streamed == list(players)
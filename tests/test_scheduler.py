@@ -0,0 +1,21 @@
+from scripts.run_lottery import deploy_lottery_local
+from scripts.scheduler import LotteryScheduler
+from scripts.helpful_scripts import LOTTERY_CLOSED
+import asyncio
+
+
+def test_scheduler_runs_lotteries_on_shared_subscription(vrf_coordinator, subscription_id, account):
+    # Arrange
+    lotteries = [deploy_lottery_local(subscription_id) for _ in range(3)]
+    for lottery in lotteries:
+        vrf_coordinator.addConsumer(subscription_id, lottery.address, {"from": account})
+    scheduler = LotteryScheduler(lotteries, vrf_coordinator, subscription_id, max_pending_requests=2, pick_winner_interval=0, poll_interval=0.1)
+    # Act
+    instances = asyncio.run(scheduler.run(2))
+    # Assert
+    assert scheduler.max_observed_pending <= 2
+    for instance in instances:
+        assert len(instance.winners) == 2
+        assert instance.state == LOTTERY_CLOSED
+        assert instance.lottery.getCurrentRoundId() == 2
+        assert instance.lottery.getRound(1)[0] == instance.winners[1]
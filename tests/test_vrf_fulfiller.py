@@ -0,0 +1,49 @@
+from brownie import web3
+from scripts.run_lottery import deploy_lottery_local
+from scripts.vrf_fulfiller import VRFFulfiller
+from scripts.waiters import wait_for_winner
+from scripts.helpful_scripts import LOTTERY_CLOSED
+
+
+def test_requests_are_fulfilled_in_one_batch_with_seed(lottery, vrf_coordinator, subscription_id, account, play_round):
+    # Arrange
+    second_lottery = deploy_lottery_local(subscription_id)
+    vrf_coordinator.addConsumer(subscription_id, second_lottery.address, {"from": account})
+    fulfiller = VRFFulfiller(vrf_coordinator, seed=42)
+    request_ids = [play_round(fulfill=False)[0], play_round(fulfill=False, round_lottery=second_lottery)[0]]
+    # Act
+    txs = fulfiller.poll_once()
+    # Assert
+    assert len(txs) == 1
+    assert sorted(fulfiller.fulfilled) == sorted(request_ids)
+    assert fulfiller.failures == []
+    assert fulfiller.poll_once() == []
+    assert lottery.getLotteryState() == LOTTERY_CLOSED
+    assert second_lottery.getLotteryState() == LOTTERY_CLOSED
+    # Same seed always gives the same random words
+    winner_picked = [event for event in txs[0].events["WinnerPicked"] if event.address == lottery.address][0]
+    assert winner_picked["randomWord"] == VRFFulfiller(vrf_coordinator, seed=42).random_words(request_ids[0], 1)[0]
+
+
+def test_background_fulfiller_answers_requests(lottery, vrf_coordinator, vrf_fulfiller, account, play_round):
+    # Arrange
+    from_block = web3.eth.block_number
+    # Act
+    requestId, _ = play_round(fulfill=False)
+    winner_picked = wait_for_winner(vrf_coordinator, lottery, requestId, from_block, timeout=30)
+    # Assert
+    assert winner_picked.args["recentWinner"] == account
+    assert requestId in vrf_fulfiller.fulfilled
+
+
+def test_reverted_callback_is_reported_as_failure(vrf_coordinator, play_round):
+    # Arrange
+    fulfiller = VRFFulfiller(vrf_coordinator)
+    # Nobody bought ticket, so lottery callback reverts and coordinator reports unsuccessful fulfillment
+    requestId, _ = play_round([], fulfill=False)
+    # Act
+    txs = fulfiller.poll_once()
+    # Assert
+    assert len(txs) == 1
+    assert fulfiller.fulfilled == []
+    assert fulfiller.failures == [requestId]
@@ -0,0 +1,33 @@
+from scripts.run_lottery import deploy_lottery_local
+from scripts.helpful_scripts import LOTTERY_OPEN, LOTTERY_CLOSED
+from scripts.waiters import TransactionRevertedError, WaitTimeoutError, poll_until, wait_for_lottery_state, wait_for_subscription
+import pytest
+
+
+def test_poll_until_times_out():
+    # Act / Assert
+    with pytest.raises(WaitTimeoutError):
+        poll_until(lambda: None, 0.05, "nothing", poll_interval=0.01)
+
+
+def test_waiting_for_subscription_and_state(vrf_coordinator, account):
+    # Act
+    create_sub_tx = vrf_coordinator.createSubscription({"from": account})
+    subId = wait_for_subscription(vrf_coordinator, create_sub_tx, timeout=10)
+    lottery = deploy_lottery_local(subId)
+    closed_state = wait_for_lottery_state(lottery, LOTTERY_CLOSED, timeout=10)
+    lottery.startLottery({"from": account})
+    opened_state = wait_for_lottery_state(lottery, LOTTERY_OPEN, timeout=10)
+    # Assert
+    assert subId == create_sub_tx.return_value
+    assert closed_state == LOTTERY_CLOSED
+    assert opened_state == LOTTERY_OPEN
+
+
+def test_reverted_subscription_is_not_reported_as_timeout(vrf_coordinator, account):
+    # Arrange
+    # Gas limit is too low for subscription to be stored, so transaction reverts once it is mined
+    create_sub_tx = vrf_coordinator.createSubscription({"from": account, "gas_limit": 30000, "required_confs": 0})
+    # Act / Assert
+    with pytest.raises(TransactionRevertedError):
+        wait_for_subscription(vrf_coordinator, create_sub_tx, timeout=10)